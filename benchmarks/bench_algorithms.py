@@ -0,0 +1,63 @@
+"""
+Key generation, signing and verification throughput and signature size for
+each signature algorithm in core.algorithms.
+
+    python -m benchmarks.bench_algorithms --seconds 2
+"""
+import argparse
+import hashlib
+import os
+import time
+
+from benchmarks.common import dump_json, print_table, setup_django
+
+
+def ops_per_second(fn, seconds):
+    # Runs fn repeatedly for about `seconds`
+    count = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--algorithms', default=None, help='Comma separated algorithm names (default: all)')
+    parser.add_argument('--key-size', type=int, default=2048, help='RSA key size')
+    parser.add_argument('--seconds', type=float, default=2.0, help='Time spent on each measurement')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from core.algorithms import ALGORITHMS, get_algorithm
+
+    names = args.algorithms.split(',') if args.algorithms else list(ALGORITHMS)
+    digest = hashlib.sha256(os.urandom(1024)).digest()
+    rows, results = [], []
+    for name in names:
+        algorithm = get_algorithm(name)
+        private_pem, public_pem = algorithm.generate(args.key_size)
+        private_key, public_key = algorithm.import_key(private_pem), algorithm.import_key(public_pem)
+        signature = algorithm.sign(private_key, digest)
+        assert algorithm.verify(public_key, digest, signature)
+
+        keygen = ops_per_second(lambda: algorithm.generate(args.key_size), args.seconds)
+        sign = ops_per_second(lambda: algorithm.sign(private_key, digest), args.seconds)
+        verify = ops_per_second(lambda: algorithm.verify(public_key, digest, signature), args.seconds)
+        results.append({
+            'algorithm': name, 'keygen_per_s': keygen, 'sign_per_s': sign, 'verify_per_s': verify,
+            'signature_bytes': len(signature), 'public_key_pem_bytes': len(public_pem),
+        })
+        rows.append((name, f"{keygen:.1f}", f"{sign:.0f}", f"{verify:.0f}", len(signature), len(public_pem)))
+
+    print_table(('algorithm', 'keygen/s', 'sign/s', 'verify/s', 'signature bytes', 'public key PEM bytes'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'algorithms', 'key_size': args.key_size, 'results': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Signing N files with N requests to sign_file_view vs one request to
+sign_files_view.
+
+    python -m benchmarks.bench_batch_sign --files 200 --size 1M
+"""
+import argparse
+import os
+
+from benchmarks.common import (Timer, dump_json, format_size, parse_size, print_table, setup_django,
+                               test_environment)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--size', default='256K', help='Size of each file (K/M/G suffixes)')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.files.base import ContentFile
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from core import utils
+    from core.models import UploadedFile
+
+    size = parse_size(args.size)
+    with test_environment():
+        user = User.objects.create_user('bench', password='benchmark')
+        client = Client()
+        client.force_login(user)
+        content = os.urandom(size)
+        files = [UploadedFile.objects.create(owner=user, uploaded_file=ContentFile(content, name=f'doc{i}.bin'))
+                 for i in range(args.files)]
+
+        def reset():
+            UploadedFile.objects.update(signature=None, signing_status=UploadedFile.SIGNING_UNSIGNED)
+            utils.private_key_cache.clear()
+
+        def single():
+            for f in files:
+                client.post('/sign-file/', {'file_id': f.pk})
+
+        def batch():
+            client.post('/sign-files/', {'all_unsigned': '1'}, HTTP_ACCEPT='application/json')
+
+        rows, results = [], []
+        for mode, fn in (('single', single), ('batch', batch)):
+            reset()
+            with CaptureQueriesContext(connection) as queries, Timer() as t:
+                fn()
+            assert not UploadedFile.objects.filter(signature__isnull=True).exists()
+            files_per_s = args.files / t.elapsed
+            results.append({'mode': mode, 'files': args.files, 'size': size, 'seconds': t.elapsed,
+                            'files_per_s': files_per_s, 'queries': len(queries)})
+            rows.append((mode, args.files, format_size(size), f"{t.elapsed:.2f}s", f"{files_per_s:.0f}", len(queries)))
+
+    print_table(('mode', 'files', 'size', 'time', 'files/s', 'queries'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'batch_sign', 'results': results})
+
+
+if __name__ == '__main__':
+    main()
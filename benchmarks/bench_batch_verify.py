@@ -0,0 +1,84 @@
+"""
+Verifications per second through the HTML verify form (one document per POST)
+and through the batch JSON API, with documents and with pre-hashed digests.
+
+    python -m benchmarks.bench_batch_verify --items 1000 --batch-size 250
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+
+from benchmarks.common import Timer, dump_json, print_table, setup_django, test_environment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=250)
+    parser.add_argument('--signers', type=int, default=10)
+    parser.add_argument('--size', type=int, default=16 * 1024, help='Document size in bytes')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test import Client, override_settings
+    from core import utils
+    from core.models import UserKeyPair
+
+    rows, results = [], []
+    with test_environment(), override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=None):
+        keys = []
+        for i in range(args.signers):
+            user = User.objects.create_user(f'signer{i}', password='benchmark')
+            keys.append((user.username, utils.load_private_key(UserKeyPair.objects.get(user=user))))
+        items = []
+        for i in range(args.items):
+            username, key = keys[i % len(keys)]
+            document = os.urandom(args.size)
+            items.append((username, document, base64.b64encode(utils.sign_message(key, document)).decode()))
+
+        client = Client()
+
+        def form():
+            for username, document, signature in items:
+                client.post('/verify/', {
+                    'original_file': SimpleUploadedFile('doc.bin', document),
+                    'signature_file': SimpleUploadedFile('sig.json', json.dumps(
+                        {'signer_username': username, 'signature': signature}).encode()),
+                })
+
+        def batch(with_documents):
+            def run():
+                for start in range(0, len(items), args.batch_size):
+                    body = [
+                        {'signer': username, 'signature': signature,
+                         **({'document': base64.b64encode(document).decode()} if with_documents
+                            else {'digest': hashlib.sha256(document).hexdigest()})}
+                        for username, document, signature in items[start:start + args.batch_size]
+                    ]
+                    response = client.post('/api/verify/', json.dumps({'items': body}), content_type='application/json')
+                    assert response.json()['valid'] == len(body)
+            return run
+
+        for label, run in (
+            ('form, one per request', form),
+            ('batch API, documents', batch(True)),
+            ('batch API, digests', batch(False)),
+        ):
+            with Timer() as t:
+                run()
+            rate = args.items / t.elapsed
+            results.append({'approach': label, 'items': args.items, 'seconds': t.elapsed, 'items_per_s': rate})
+            rows.append((label, args.items, f"{t.elapsed:.2f}s", f"{rate:.0f}"))
+
+    print_table(('approach', 'items', 'time', 'items/s'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'batch_verify', 'results': results})
+
+
+if __name__ == '__main__':
+    main()
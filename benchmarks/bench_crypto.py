@@ -0,0 +1,86 @@
+"""
+Microbenchmarks of the core.utils crypto primitives: generate_keys,
+sign_message and verify_signature across payload and key sizes, and
+encrypt_key/decrypt_key on each key's private PEM.
+
+Signing and verification are given already imported keys, as the views get
+them from the key caches. Each case is timed with timeit: the loop count is
+calibrated to run for at least 0.2s, and the median of --rounds runs is
+reported. Payloads come from a seeded generator, so runs are repeatable.
+
+    python -m benchmarks.bench_crypto --key-sizes 2048,3072,4096 --sizes 1K,64K,1M,16M --json crypto.json
+"""
+import argparse
+import random
+import statistics
+import timeit
+
+from benchmarks.common import dump_json, format_size, parse_size, print_table, setup_django
+
+
+def measure(fn, rounds):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    per_op = sorted(t / number for t in timer.repeat(repeat=rounds, number=number))
+    return statistics.median(per_op), per_op[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--algorithms', default='rsa', help='Comma separated algorithm names')
+    parser.add_argument('--key-sizes', default='2048,3072,4096', help='Comma separated RSA key sizes')
+    parser.add_argument('--sizes', default='1K,64K,1M,16M', help='Comma separated payload sizes to sign and verify')
+    parser.add_argument('--rounds', type=int, default=5, help='Timed runs per case; the median is reported')
+    parser.add_argument('--keygen-rounds', type=int, default=3, help='Timed runs for key generation, which is slow')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the payload generator')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from core import utils
+    from core.algorithms import RSA_PKCS1_SHA256, get_algorithm
+
+    rng = random.Random(args.seed)
+    payloads = {size: rng.randbytes(size) for size in (parse_size(s) for s in args.sizes.split(','))}
+    keys = []
+    for name in args.algorithms.split(','):
+        # Key size only means something for RSA
+        sizes = [int(s) for s in args.key_sizes.split(',')] if name == RSA_PKCS1_SHA256 else [None]
+        keys.extend((name, key_size) for key_size in sizes)
+
+    rows, results = [], []
+
+    def add(case, algorithm, key_size, size, rounds, fn):
+        median, best = measure(fn, rounds)
+        result = {'case': case, 'algorithm': algorithm, 'key_size': key_size, 'size': size,
+                  'us_per_op': median * 1e6, 'best_us_per_op': best * 1e6, 'ops_per_s': 1 / median}
+        if size:
+            result['mb_per_s'] = size / median / 1024 ** 2
+        results.append(result)
+        rows.append((case, algorithm, key_size or '-', format_size(size) if size else '-',
+                     f"{median * 1e6:,.1f}", f"{1 / median:,.1f}", f"{result['mb_per_s']:,.1f}" if size else '-'))
+
+    for name, key_size in keys:
+        algorithm = get_algorithm(name)
+        private_pem, public_pem = utils.generate_keys(key_size or 2048, name)
+        private_key, public_key = algorithm.import_key(private_pem), algorithm.import_key(public_pem)
+        encrypted = utils.encrypt_key(private_pem)
+
+        add('generate_keys', name, key_size, None, args.keygen_rounds,
+            lambda: utils.generate_keys(key_size or 2048, name))
+        add('encrypt_key', name, key_size, len(private_pem), args.rounds, lambda: utils.encrypt_key(private_pem))
+        add('decrypt_key', name, key_size, len(private_pem), args.rounds, lambda: utils.decrypt_key(encrypted))
+        for size, payload in payloads.items():
+            signature = utils.sign_message(private_key, payload)
+            assert utils.verify_signature(public_key, payload, signature)
+            add('sign_message', name, key_size, size, args.rounds, lambda: utils.sign_message(private_key, payload))
+            add('verify_signature', name, key_size, size, args.rounds,
+                lambda: utils.verify_signature(public_key, payload, signature))
+
+    print_table(('case', 'algorithm', 'key size', 'payload', 'us/op', 'ops/s', 'MB/s'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'crypto', 'rounds': args.rounds, 'seed': args.seed, 'results': results})
+
+
+if __name__ == '__main__':
+    main()
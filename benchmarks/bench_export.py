@@ -0,0 +1,67 @@
+"""
+Time to first byte, total time and peak Python memory of the streaming ZIP
+export as the number of signed files grows.
+
+    python -m benchmarks.bench_export --counts 10,100,1000 --size 64K
+"""
+import argparse
+import base64
+import os
+import time
+import tracemalloc
+
+from benchmarks.common import (dump_json, format_size, parse_size, print_table,
+                               setup_django, test_environment)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counts', default='10,100,1000', help='Comma separated numbers of signed files')
+    parser.add_argument('--size', default='64K', help='Document size (K/M/G suffixes)')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test import Client
+    from core.models import UploadedFile
+
+    size = parse_size(args.size)
+    rows, results = [], []
+    with test_environment():
+        user = User.objects.create_user('exporter', password='benchmark')
+        client = Client()
+        client.force_login(user)
+        signature = base64.b64encode(os.urandom(256)).decode()
+        created = 0
+        for count in sorted(int(c) for c in args.counts.split(',')):
+            # Signatures aren't checked by the export, so random ones will do
+            for i in range(created, count):
+                UploadedFile.objects.create(
+                    owner=user, uploaded_file=SimpleUploadedFile(f'doc{i}.bin', os.urandom(size)),
+                    original_name=f'doc{i}.bin', signature=signature, signature_algorithm='rsa',
+                    signing_status=UploadedFile.SIGNING_DONE,
+                )
+            created = count
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            parts = iter(client.get('/export/').streaming_content)
+            first = next(part for part in parts if part)
+            ttfb = time.perf_counter() - started
+            total = len(first) + sum(len(part) for part in parts)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.append({'files': count, 'archive_bytes': total, 'ttfb_seconds': ttfb,
+                            'seconds': elapsed, 'peak_bytes': peak})
+            rows.append((count, format_size(total), f"{ttfb * 1000:.1f}ms", f"{elapsed:.2f}s", format_size(peak)))
+
+    print_table(('files', 'archive', 'first byte', 'total', 'peak memory'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'export', 'size': size, 'results': results})
+
+
+if __name__ == '__main__':
+    main()
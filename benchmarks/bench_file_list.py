@@ -0,0 +1,74 @@
+"""
+File list page latency: the old load-everything-and-sort approach vs the
+keyset-paginated query, for users owning many files.
+
+    python -m benchmarks.bench_file_list --rows 10000,100000,1000000
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks.common import Timer, dump_json, print_table, setup_django, test_environment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='10000,100000', help='Comma separated file counts')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.utils import timezone
+    from core.models import UploadedFile
+
+    def legacy_list(user):
+        # The pre-pagination get_queryset: every row into Python, then sorted()
+        files = UploadedFile.objects.filter(owner=user)
+        recent_threshold = timezone.now() - timedelta(minutes=5)
+        for file in files:
+            file.is_new = file.upload_date >= recent_threshold
+        return sorted(files, key=lambda f: (f.is_new, f.upload_date), reverse=True)
+
+    rows, results = [], []
+    with test_environment():
+        user = User.objects.create_user('bench', password='benchmark')
+        client = Client()
+        client.force_login(user)
+        created = 0
+        start = timezone.now()
+        for count in sorted(int(c) for c in args.rows.split(',')):
+            while created < count:
+                batch = min(5000, count - created)
+                UploadedFile.objects.bulk_create([
+                    UploadedFile(owner=user, uploaded_file=f'uploads/file{i}.pdf', original_name=f'file{i}.pdf',
+                                 upload_date=start - timedelta(seconds=i))
+                    for i in range(created, created + batch)
+                ])
+                created += batch
+
+            first = client.get('/uploads/')
+            cursor = first.context['older_cursor']
+            timings = {}
+            for label, fn in (
+                ('legacy (all rows)', lambda: legacy_list(user)),
+                ('keyset page 1', lambda: client.get('/uploads/')),
+                ('keyset page 2', lambda: client.get('/uploads/', {'after': cursor})),
+            ):
+                best = None
+                for _ in range(args.repeat):
+                    with Timer() as t:
+                        fn()
+                    best = t.elapsed if best is None else min(best, t.elapsed)
+                timings[label] = best
+                rows.append((count, label, f"{best * 1000:.1f} ms"))
+            results.append({'rows': count, 'seconds': timings})
+
+    print_table(('rows', 'approach', 'best time'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'file_list', 'results': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Hashing throughput for verification: one SHA-256 over the whole file vs the
+Merkle chunk hashes computed on 1..N threads.
+
+    python -m benchmarks.bench_merkle --sizes 256M,1G,4G --workers 1,2,4,8
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.common import (Timer, dump_json, format_size, parse_size, print_table,
+                               setup_django, write_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='256M,1G', help='Comma separated file sizes (K/M/G suffixes)')
+    parser.add_argument('--workers', default=None, help='Comma separated thread counts (default: 1 up to the CPU count)')
+    parser.add_argument('--chunk-size', default='4M')
+    parser.add_argument('--dir', default=None, help='Directory for the temporary files')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from core.merkle import chunk_hashes
+    from core.utils import hash_file
+
+    chunk_size = parse_size(args.chunk_size)
+    cpus = os.cpu_count() or 1
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(',')]
+    else:
+        worker_counts = sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+
+    rows, results = [], []
+    for size in (parse_size(s) for s in args.sizes.split(',')):
+        fd, path = tempfile.mkstemp(dir=args.dir)
+        os.close(fd)
+        try:
+            write_file(path, size)
+            hash_file(path)  # warm the page cache so every run reads from memory
+
+            runs = [('sha256, whole file', lambda: hash_file(path))]
+            runs += [(f'merkle, {w} thread(s)', lambda w=w: chunk_hashes(path, chunk_size, w)) for w in worker_counts]
+            for label, fn in runs:
+                with Timer() as t:
+                    fn()
+                throughput = size / t.elapsed / 1024 ** 2
+                results.append({'size': size, 'approach': label, 'seconds': t.elapsed, 'mb_per_s': throughput})
+                rows.append((format_size(size), label, f"{t.elapsed:.2f}s", f"{throughput:.0f}"))
+        finally:
+            os.remove(path)
+
+    print_table(('size', 'approach', 'time', 'MB/s'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'merkle', 'chunk_size': chunk_size, 'results': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Cost of the instrumentation: one metrics.stage() block and one sign-file
+request, with METRICS_ENABLED off and on.
+
+    python -m benchmarks.bench_metrics --iterations 1000000 --requests 200
+"""
+import argparse
+
+from benchmarks.common import Timer, dump_json, print_table, setup_django, test_environment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=1000000, help='stage() blocks timed per setting')
+    parser.add_argument('--requests', type=int, default=200, help='Sign requests timed per setting')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test import Client, override_settings
+    from core import metrics
+    from core.models import UploadedFile
+
+    rows, results = [], []
+    with test_environment():
+        user = User.objects.create_user('measured', password='benchmark')
+        client_by_setting = {}
+        for enabled in (False, True):
+            with override_settings(METRICS_ENABLED=enabled):
+                # The middleware decides whether it is used when the handler is built
+                client_by_setting[enabled] = Client()
+                client_by_setting[enabled].force_login(user)
+        client_by_setting[False].post('/upload/', {'uploaded_files': [SimpleUploadedFile('doc.txt', b'x' * 65536)]})
+        file_id = UploadedFile.objects.get().pk
+
+        for enabled in (False, True):
+            label = 'enabled' if enabled else 'disabled'
+            with override_settings(METRICS_ENABLED=enabled):
+                with Timer() as t:
+                    for _ in range(args.iterations):
+                        with metrics.stage('bench'):
+                            pass
+                ns = t.elapsed / args.iterations * 1e9
+                results.append({'case': 'stage()', 'metrics': label, 'ns_per_op': ns})
+                rows.append(('stage() block', label, f"{ns:.0f}ns"))
+
+                client = client_by_setting[enabled]
+                client.post('/sign-file/', {'file_id': file_id})  # warm the key caches
+                with Timer() as t:
+                    for _ in range(args.requests):
+                        client.post('/sign-file/', {'file_id': file_id})
+                us = t.elapsed / args.requests * 1e6
+                results.append({'case': 'sign request', 'metrics': label, 'us_per_request': us})
+                rows.append(('sign request', label, f"{us:.0f}us"))
+            metrics.reset()
+
+    print_table(('case', 'metrics', 'time'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'metrics', 'results': results})
+
+
+if __name__ == '__main__':
+    main()
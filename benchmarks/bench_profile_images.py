@@ -0,0 +1,99 @@
+"""
+Profile update latency with a large camera photo: resizing inside the request
+(the old Profile.save) vs handing it to the image pipeline, and the pipeline's
+own cost vs a full-resolution decode and thumbnail.
+
+    python -m benchmarks.bench_profile_images --megapixels 12,24 --repeat 5
+"""
+import argparse
+import io
+import os
+from unittest import mock
+
+from benchmarks.common import Timer, dump_json, print_table, setup_django, test_environment
+
+
+def camera_photo(megapixels):
+    from PIL import Image
+
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    # Noise compresses about as badly as a real photo, so the file size is realistic
+    image = Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def legacy_resize(profile):
+    # What Profile.save used to do on every save
+    from PIL import Image
+
+    img = Image.open(profile.image.path)
+    if img.height > 300 or img.width > 300:
+        img.thumbnail((300, 300))
+        img.save(profile.image.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megapixels', default='12,24', help='Comma separated photo sizes')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test import Client, override_settings
+    from users import images
+
+    rows, results = [], []
+    with test_environment(), override_settings(PROFILE_IMAGES_IN_BACKGROUND=True):
+        user = User.objects.create_user('photographer', password='benchmark', email='p@example.com')
+        client = Client()
+        client.force_login(user)
+
+        for megapixels in (float(m) for m in args.megapixels.split(',')):
+            photo = camera_photo(megapixels)
+
+            def update_profile():
+                # A fresh file each time, or the unchanged-content check would skip the work
+                data = photo + os.urandom(8)  # trailing bytes after the JPEG end marker are ignored
+                client.post('/profile/', {'username': user.username, 'email': user.email,
+                                          'image': SimpleUploadedFile('photo.jpg', data, 'image/jpeg')})
+                return user.profile.__class__.objects.get(user=user)
+
+            def in_request():
+                with mock.patch('users.models.schedule_variants', legacy_resize):
+                    update_profile()
+
+            def full_decode():
+                from PIL import Image
+                with Image.open(io.BytesIO(photo)) as image:
+                    image.load()
+                    image.thumbnail((256, 256))
+
+            runs = [
+                ('request, resize in request (before)', in_request),
+                ('request, pipeline (after)', update_profile),
+                ('full decode + thumbnail', full_decode),
+                ('pipeline: draft/reduce, 3 sizes x 2 formats',
+                 lambda: images.render_variants(io.BytesIO(photo), 'bench' + os.urandom(8).hex())),
+            ]
+            for label, fn in runs:
+                fn()  # warm up
+                with Timer() as t:
+                    for _ in range(args.repeat):
+                        fn()
+                ms = t.elapsed / args.repeat * 1000
+                results.append({'megapixels': megapixels, 'bytes': len(photo), 'case': label, 'ms': ms})
+                rows.append((f"{megapixels:g} MP", label, f"{ms:.1f}ms"))
+
+    print_table(('photo', 'case', 'time'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'profile_images', 'results': results})
+
+
+if __name__ == '__main__':
+    main()
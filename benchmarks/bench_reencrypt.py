@@ -0,0 +1,58 @@
+"""
+Throughput of `manage.py reencrypt_keys`: private keys re-encrypted per
+second under a new master key, by worker count and batch size.
+
+    python -m benchmarks.bench_reencrypt --rows 20000 --workers 1,4 --batch-sizes 500,2000
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import Timer, dump_json, print_table, setup_django, test_environment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000, help='Stored key pairs')
+    parser.add_argument('--workers', default='1,4', help='Comma separated re-encryption thread counts')
+    parser.add_argument('--batch-sizes', default='500,2000', help='Comma separated batch sizes')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.test.utils import override_settings
+    from core import utils
+    from core.models import UserKeyPair
+    from core.reencryption import run_reencryption
+
+    rows, results = [], []
+    with test_environment():
+        # bulk_create skips the signal that would generate a key pair per user
+        User.objects.bulk_create([User(username=f'user{i}') for i in range(args.rows)])
+        private_pem, public_pem = utils.generate_keys(2048)
+        UserKeyPair.objects.bulk_create([
+            UserKeyPair(user_id=user_id, public_key=public_pem.decode(), private_key_encrypted=utils.encrypt_key(private_pem),
+                        key_version=utils.current_key_version())
+            for user_id in User.objects.values_list('pk', flat=True)
+        ], batch_size=1000)
+
+        # Every run rotates to a new master key and keeps the older ones for decryption
+        secrets = [utils.settings.SECRET_KEY]
+        for workers in (int(w) for w in args.workers.split(',')):
+            for batch_size in (int(b) for b in args.batch_sizes.split(',')):
+                secrets.insert(0, f'benchmark-key-{len(secrets)}')
+                with override_settings(FERNET_KEYS=list(secrets)):
+                    with ThreadPoolExecutor(workers) as pool, Timer() as t:
+                        checkpoint = run_reencryption(UserKeyPair, pool, workers, batch_size)
+                assert checkpoint.processed == args.rows
+                results.append({'workers': workers, 'batch_size': batch_size, 'rows': args.rows,
+                                'seconds': t.elapsed, 'rows_per_s': args.rows / t.elapsed})
+                rows.append((workers, batch_size, f"{t.elapsed:.2f}s", f"{args.rows / t.elapsed:,.0f}"))
+
+    print_table(('workers', 'batch size', 'time', 'rows/s'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'reencrypt', 'rows': args.rows, 'results': results})
+
+
+if __name__ == '__main__':
+    main()
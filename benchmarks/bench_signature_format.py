@@ -0,0 +1,61 @@
+"""
+Size and parse speed of the JSON signature file vs the binary container, per
+algorithm and for a Merkle-mode signature.
+
+    python -m benchmarks.bench_signature_format --count 100000
+"""
+import argparse
+import base64
+import json
+import os
+
+from benchmarks.common import Timer, dump_json, print_table, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=100000, help='Signature files parsed per format')
+    parser.add_argument('--leaves', type=int, default=256, help='Chunks in the Merkle-mode case (1 GiB at 4 MiB)')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from core.algorithms import ALGORITHMS
+    from core.container import encode_container, read_signature_file
+    from core.merkle import DEFAULT_MERKLE_CHUNK_SIZE
+    from core.utils import key_fingerprint
+
+    cases = []
+    for name, algorithm in ALGORITHMS.items():
+        private_pem, public_pem = algorithm.generate()
+        signature = algorithm.sign(algorithm.import_key(private_pem), os.urandom(32))
+        cases.append((name, name, key_fingerprint(public_pem.decode()), signature, None))
+    leaves = [os.urandom(32).hex() for _ in range(args.leaves)]
+    merkle = (DEFAULT_MERKLE_CHUNK_SIZE, DEFAULT_MERKLE_CHUNK_SIZE * args.leaves, leaves)
+    cases.append((f'rsa, merkle ({args.leaves} leaves)', *cases[0][1:4], merkle))
+
+    rows, results = [], []
+    for label, algorithm, fingerprint, signature, tree in cases:
+        signature_data = {'signer_username': 'alice', 'algorithm': algorithm, 'mode': 'merkle' if tree else 'digest',
+                          'signature': base64.b64encode(signature).decode()}
+        if tree:
+            signature_data['merkle'] = {'hash': 'sha256', 'chunk_size': tree[0], 'size': tree[1], 'leaves': tree[2]}
+        formats = {
+            'json': json.dumps(signature_data, indent=4).encode(),
+            'binary': encode_container('alice', algorithm, fingerprint, signature, tree),
+        }
+        for format_name, data in formats.items():
+            with Timer() as t:
+                for _ in range(args.count):
+                    read_signature_file(data)
+            rate = args.count / t.elapsed
+            results.append({'case': label, 'format': format_name, 'bytes': len(data), 'parses_per_s': rate})
+            rows.append((label, format_name, len(data), f"{rate:,.0f}"))
+
+    print_table(('case', 'format', 'bytes', 'parses/s'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'signature_format', 'results': results})
+
+
+if __name__ == '__main__':
+    main()
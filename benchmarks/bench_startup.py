@@ -0,0 +1,92 @@
+"""
+Cold-start cost of a worker process, from `python -X importtime` profiles of
+fresh interpreters: total import time, the time spent importing each package
+(summed self times), and the wall time to get to a loaded app.
+
+Packages listed in --forbid must not be imported at startup (they're loaded
+lazily, when first needed); the script exits with status 1 if one is.
+
+    python -m benchmarks.bench_startup --runs 10 --json startup.json
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import BASE_DIR, dump_json, print_table
+
+# What each kind of process imports before doing any work
+TARGETS = {
+    'setup': 'import django; django.setup()',
+    'wsgi': 'import digital_signature.wsgi; from django.urls import resolve; resolve("/")',
+    'asgi': 'import digital_signature.asgi; from django.urls import resolve; resolve("/")',
+}
+PACKAGES = ('django', 'core', 'users', 'digital_signature', 'asgiref', 'PIL', 'Crypto', 'cryptography')
+
+
+def profile(code):
+    # Returns [(module, self us, cumulative us)] and the child's own time to run `code`
+    timed = f'import time; _start = time.perf_counter(); {code}; print(time.perf_counter() - _start)'
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='digital_signature.settings')
+    env.setdefault('SECRET_KEY', 'benchmark-secret-key')
+    child = subprocess.run([sys.executable, '-X', 'importtime', '-c', timed], cwd=BASE_DIR, env=env,
+                           capture_output=True, text=True, check=True)
+    modules = []
+    for line in child.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules, float(child.stdout.strip().splitlines()[-1])
+
+
+def package_of(module):
+    return module.split('.', 1)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', default='setup,wsgi', help=f"Comma separated: {', '.join(TARGETS)}")
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per target; medians are reported')
+    parser.add_argument('--forbid', default='Crypto,cryptography', help='Packages that must not load at startup')
+    parser.add_argument('--top', type=int, default=10, help='Slowest individual modules to list')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    forbidden = [p for p in args.forbid.split(',') if p]
+    rows, results, violations = [], [], []
+    for target in args.targets.split(','):
+        code = TARGETS[target]
+        profile(code)  # writes any missing .pyc files, so they don't count against the first run
+        runs = [profile(code) for _ in range(args.runs)]
+
+        seconds = statistics.median(elapsed for _, elapsed in runs)
+        total_us = statistics.median(sum(self_us for _, self_us, _ in modules) for modules, _ in runs)
+        results.append({'target': target, 'package': '(all)', 'seconds': seconds, 'import_us': total_us})
+        rows.append((target, '(all)', f"{total_us / 1000:.1f} ms", f"{seconds * 1000:.1f} ms"))
+        for package in PACKAGES:
+            package_us = statistics.median(sum(self_us for name, self_us, _ in modules if package_of(name) == package)
+                                           for modules, _ in runs)
+            results.append({'target': target, 'package': package, 'import_us': package_us})
+            rows.append((target, package, f"{package_us / 1000:.1f} ms", ''))
+
+        modules, _ = runs[-1]
+        loaded = {package_of(name) for name, _, _ in modules}
+        violations.extend(f"{target} imports {package} at startup" for package in forbidden if package in loaded)
+        slowest = sorted(modules, key=lambda m: m[1], reverse=True)[:args.top]
+        print(f"Slowest modules to import for '{target}' (self time):")
+        for name, self_us, _ in slowest:
+            print(f"  {self_us / 1000:7.1f} ms  {name}")
+
+    print_table(('target', 'package', 'import time', 'wall time'), rows)
+    for violation in violations:
+        print(f"FAILED: {violation}")
+    if args.json:
+        dump_json(args.json, {'benchmark': 'startup', 'runs': args.runs, 'results': results,
+                              'violations': violations})
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == '__main__':
+    main()
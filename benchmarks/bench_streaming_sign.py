@@ -0,0 +1,96 @@
+"""
+Peak memory and throughput of whole-file signing vs the streaming signing path.
+
+    python -m benchmarks.bench_streaming_sign --sizes 1M,16M,256M,1G,4G
+"""
+import argparse
+import os
+import tempfile
+import tracemalloc
+
+from benchmarks.common import (Timer, dump_json, format_size, parse_size, print_table,
+                               setup_django, write_file)
+
+
+def reset_peak_rss():
+    # Linux only: writing "5" to clear_refs resets VmHWM for this process
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def measure(fn):
+    rss_tracked = reset_peak_rss()
+    rss_before = peak_rss()
+    tracemalloc.start()
+    with Timer() as t:
+        fn()
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_growth = peak_rss() - rss_before if rss_tracked and rss_before is not None else None
+    return t.elapsed, heap_peak, rss_growth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1M,16M,256M,1G', help='Comma separated file sizes (K/M/G suffixes)')
+    parser.add_argument('--legacy-max', default='256M', help='Largest size to run the read()-everything path on')
+    parser.add_argument('--chunk-size', default='1M')
+    parser.add_argument('--dir', default=None, help='Directory for the temporary files')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from core.utils import generate_keys, sign_file, sign_message
+
+    private_key, _ = generate_keys()
+    chunk_size = parse_size(args.chunk_size)
+    legacy_max = parse_size(args.legacy_max)
+
+    rows, results = [], []
+    for size in (parse_size(s) for s in args.sizes.split(',')):
+        fd, path = tempfile.mkstemp(dir=args.dir, suffix='.bin')
+        os.close(fd)
+        try:
+            write_file(path, size)
+            modes = {
+                'stream': lambda: sign_file(private_key, path, chunk_size),
+                'mmap': lambda: sign_file(private_key, path, chunk_size, use_mmap=True),
+            }
+            if size <= legacy_max:
+                def legacy():
+                    with open(path, 'rb') as f:
+                        sign_message(private_key, f.read())
+                modes['read-all'] = legacy
+
+            for mode, fn in modes.items():
+                elapsed, heap_peak, rss_growth = measure(fn)
+                throughput = size / elapsed / 1024 ** 2
+                results.append({'size': size, 'mode': mode, 'seconds': elapsed, 'mb_per_s': throughput,
+                                'heap_peak': heap_peak, 'rss_growth': rss_growth})
+                rows.append((format_size(size), mode, f"{elapsed:.3f}s", f"{throughput:.0f} MB/s",
+                             format_size(heap_peak), format_size(rss_growth) if rss_growth is not None else 'n/a'))
+        finally:
+            os.remove(path)
+
+    print_table(('size', 'mode', 'time', 'throughput', 'heap peak', 'rss growth'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'streaming_sign', 'results': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Verify requests per second through verify_signature_view with the signer
+public key cache disabled and enabled.
+
+    python -m benchmarks.bench_verify_cache --signers 20 --requests 500
+"""
+import argparse
+import base64
+import json
+import os
+import random
+
+from benchmarks.common import Timer, dump_json, print_table, setup_django, test_environment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--signers', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--size', type=int, default=64 * 1024, help='Document size in bytes')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import CaptureQueriesContext
+    from core import utils
+    from core.models import UserKeyPair
+
+    with test_environment():
+        document = os.urandom(args.size)
+        digest = utils.hashlib.sha256(document).digest()
+        payloads = []
+        for i in range(args.signers):
+            user = User.objects.create_user(f'signer{i}', password='benchmark')
+            key_pair = UserKeyPair.objects.get(user=user)
+            signature = utils.sign_digest(utils.load_private_key(key_pair), digest)
+            payloads.append(json.dumps({
+                'signer_username': user.username,
+                'signature': base64.b64encode(signature).decode(),
+            }).encode())
+
+        client = Client()
+        rows, results = [], []
+        for enabled in (False, True):
+            cache.clear()
+            utils.signer_cache.clear()
+            utils.public_key_cache.clear()
+            rng = random.Random(0)
+            with override_settings(SIGNER_CACHE_ENABLED=enabled), \
+                    CaptureQueriesContext(connection) as queries, Timer() as t:
+                for _ in range(args.requests):
+                    client.post('/verify/', {
+                        'original_file': SimpleUploadedFile('doc.bin', document),
+                        'signature_file': SimpleUploadedFile('sig.json', rng.choice(payloads)),
+                    })
+            rps = args.requests / t.elapsed
+            per_request = len(queries) / args.requests
+            label = 'enabled' if enabled else 'disabled'
+            results.append({'cache': label, 'requests': args.requests, 'seconds': t.elapsed,
+                            'requests_per_s': rps, 'queries_per_request': per_request})
+            rows.append((label, args.requests, f"{t.elapsed:.2f}s", f"{rps:.0f}", f"{per_request:.2f}"))
+
+    print_table(('cache', 'requests', 'time', 'req/s', 'queries/req'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'verify_cache', 'results': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Load comparison of the WSGI and ASGI request paths for verify, the file list
+and signature download.
+
+WSGI is driven by Django's test Client from a pool of threads (one request per
+worker thread, like a threaded WSGI server); ASGI by AsyncClient with up to
+--concurrency requests in flight on one event loop, like a single ASGI worker.
+
+    python -m benchmarks.bench_wsgi_asgi --concurrency 1,8,32 --requests 200
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import (Timer, dump_json, format_size, parse_size, print_table,
+                               setup_django, test_environment)
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'requests_per_s': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def run_wsgi(make_request, user, requests, concurrency):
+    from django.test import Client
+
+    clients = [Client() for _ in range(concurrency)]
+    for client in clients:
+        client.force_login(user)
+
+    def timed(i):
+        with Timer() as t:
+            response = make_request(clients[i % concurrency])
+        assert response.status_code < 400, response.status_code
+        return t.elapsed
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        with Timer() as total:
+            latencies = list(pool.map(timed, range(requests)))
+    return summarize(latencies, total.elapsed)
+
+
+def run_asgi(make_request, user, requests, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient()
+        await client.aforce_login(user)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed():
+            async with semaphore:
+                with Timer() as t:
+                    response = await make_request(client)
+            assert response.status_code < 400, response.status_code
+            return t.elapsed
+
+        with Timer() as total:
+            latencies = await asyncio.gather(*(timed() for _ in range(requests)))
+        return summarize(latencies, total.elapsed)
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='1,8,32', help='Comma separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+    parser.add_argument('--size', default='1M', help='Size of the verified document, e.g. 64K, 16M')
+    parser.add_argument('--files', type=int, default=200, help='Files owned by the benchmark user')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from core import utils
+    from core.models import UploadedFile, UserKeyPair
+
+    size = parse_size(args.size)
+    rows, results = [], []
+    with test_environment():
+        user = User.objects.create_user('bench', password='benchmark')
+        document = os.urandom(size)
+        key = utils.load_private_key(UserKeyPair.objects.get(user=user))
+        signature = base64.b64encode(utils.sign_message(key, document)).decode()
+        signature_json = json.dumps({'signer_username': user.username, 'signature': signature}).encode()
+        UploadedFile.objects.bulk_create([
+            UploadedFile(owner=user, uploaded_file=f'uploads/file{i}.pdf', original_name=f'file{i}.pdf',
+                         signature=signature, signing_status=UploadedFile.SIGNING_DONE)
+            for i in range(args.files)
+        ])
+        file_id = UploadedFile.objects.filter(owner=user).values_list('pk', flat=True).first()
+
+        def verify(client):
+            return client.post('/verify/', {
+                'original_file': SimpleUploadedFile('doc.bin', document),
+                'signature_file': SimpleUploadedFile('sig.json', signature_json),
+            })
+
+        scenarios = {
+            'verify': verify,
+            'file list': lambda client: client.get('/uploads/'),
+            'download signature': lambda client: client.get(f'/download-signature/{file_id}/'),
+        }
+        for name, make_request in scenarios.items():
+            for concurrency in (int(c) for c in args.concurrency.split(',')):
+                for server, run in (('wsgi', run_wsgi), ('asgi', run_asgi)):
+                    result = run(make_request, user, args.requests, concurrency)
+                    results.append({'scenario': name, 'server': server, 'concurrency': concurrency, **result})
+                    rows.append((name, server, concurrency, f"{result['requests_per_s']:.0f}",
+                                 f"{result['p50_ms']:.1f} ms", f"{result['p95_ms']:.1f} ms"))
+
+    print(f"Verified document size: {format_size(size)}")
+    print_table(('scenario', 'server', 'concurrency', 'req/s', 'p50', 'p95'), rows)
+    if args.json:
+        dump_json(args.json, {'benchmark': 'wsgi_asgi', 'size': size, 'results': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Run benchmarks from the project root, e.g. ``python -m benchmarks.bench_streaming_sign``.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'digital_signature.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key')
+    import django
+    import logging
+    django.setup()
+    # Per-request log lines would dominate the timings
+    logging.getLogger('core').setLevel(logging.WARNING)
+
+
+def parse_size(value):
+    # Accepts "512", "64K", "16M", "2G"
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip().upper()
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def format_size(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024 or unit == 'GB':
+            return f"{n:.0f}{unit}" if unit == 'B' else f"{n:.1f}{unit}"
+        n /= 1024
+
+
+def write_file(path, size, chunk_size=1024 * 1024):
+    # Writes `size` pseudo-random bytes without holding them all in memory
+    block = os.urandom(chunk_size)
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[:min(chunk_size, remaining)])
+            remaining -= chunk_size
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) if rows else len(str(h))
+              for i, h in enumerate(headers)]
+    print('  '.join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print('  '.join('-' * w for w in widths))
+    for row in rows:
+        print('  '.join(str(c).ljust(w) for c, w in zip(row, widths)))
+
+
+def environment():
+    # Recorded with every result file, so runs from different commits or machines can be told apart
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BASE_DIR,
+                                    capture_output=True, text=True, timeout=10).stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        commit, dirty = None, None
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+
+def dump_json(path, payload):
+    with open(path, 'w') as f:
+        json.dump({**payload, 'environment': environment()}, f, indent=2)
+    print(f"Results written to {path}")
+
+
+class test_environment:
+    """
+    Creates a throwaway test database and media directory for benchmarks that
+    exercise views and models. Call setup_django() first.
+    """
+    def __enter__(self):
+        import tempfile
+        from PIL import Image
+        from django.conf import settings
+        from django.test.utils import (override_settings, setup_databases,
+                                       setup_test_environment)
+
+        self.media_root = tempfile.mkdtemp(prefix='bench-media-')
+        # New users get a Profile pointing at default.jpg
+        Image.new('RGB', (300, 300), 'white').save(os.path.join(self.media_root, 'default.jpg'))
+        # Pages render without a collectstatic manifest
+        storages = {**settings.STORAGES,
+                    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+        self._settings = override_settings(MEDIA_ROOT=self.media_root, DEBUG=False, STORAGES=storages,
+                                           PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+        self._settings.enable()
+        setup_test_environment()
+        self._old_config = setup_databases(verbosity=0, interactive=False)
+        return self
+
+    def __exit__(self, *exc):
+        import shutil
+        from django.test.utils import teardown_databases, teardown_test_environment
+
+        teardown_databases(self._old_config, verbosity=0)
+        teardown_test_environment()
+        self._settings.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
@@ -0,0 +1,114 @@
+"""
+Compares two benchmark result files written with --json, e.g. from the
+parent commit and from a change, and flags metrics that got worse by more
+than --threshold percent. Exits with status 1 when any did, so it can gate CI.
+
+    git stash && python -m benchmarks.bench_crypto --json base.json
+    git stash pop && python -m benchmarks.bench_crypto --json new.json
+    python -m benchmarks.compare base.json new.json --threshold 10
+
+Rows are matched on their non-metric fields (case, size, concurrency, ...).
+Fields ending in _per_s are throughputs, where higher is better; times,
+per-operation costs, memory peaks and error counts are better lower.
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.common import print_table
+
+HIGHER_IS_BETTER = ('_per_s',)
+LOWER_IS_BETTER = ('_ms', '_us', '_seconds', '_per_op', '_per_request', '_peak', '_growth', 'peak_bytes')
+LOWER_IS_BETTER_FIELDS = ('seconds', 'ms', 'errors')
+
+
+def direction(field):
+    # +1 when a larger value is an improvement, -1 when it is a regression, None for identifying fields
+    if field.endswith(HIGHER_IS_BETTER):
+        return 1
+    if field.endswith(LOWER_IS_BETTER) or field in LOWER_IS_BETTER_FIELDS:
+        return -1
+    return None
+
+
+def split_row(row):
+    identity, metrics = [], {}
+    for field, value in row.items():
+        if isinstance(value, (dict, list)):
+            continue
+        if direction(field) is not None and isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[field] = value
+        else:
+            identity.append((field, value))
+    return tuple(sorted(identity, key=lambda item: item[0])), metrics
+
+
+def load(path):
+    with open(path) as f:
+        payload = json.load(f)
+    rows = {}
+    for row in payload.get('results', []):
+        identity, metrics = split_row(row)
+        rows[identity] = metrics
+    return payload, rows
+
+
+def describe(payload):
+    environment = payload.get('environment') or {}
+    commit = environment.get('commit') or 'unknown commit'
+    if environment.get('dirty'):
+        commit += ' (with local changes)'
+    return f"{payload.get('benchmark', '?')} at {commit}, Python {environment.get('python', '?')}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base', help='Results of the baseline run')
+    parser.add_argument('new', help='Results of the run to check')
+    parser.add_argument('--threshold', type=float, default=5.0, help='Percent change that counts as a regression')
+    parser.add_argument('--metrics', help='Comma separated metric fields to compare (default: all)')
+    parser.add_argument('--all', action='store_true', help='List every compared metric, not only regressions')
+    args = parser.parse_args()
+
+    base, base_rows = load(args.base)
+    new, new_rows = load(args.new)
+    if base.get('benchmark') != new.get('benchmark'):
+        parser.error(f"{args.base} is from '{base.get('benchmark')}' but {args.new} is from '{new.get('benchmark')}'")
+    wanted = set(args.metrics.split(',')) if args.metrics else None
+
+    rows, regressions, compared = [], 0, 0
+    for identity, base_metrics in base_rows.items():
+        new_metrics = new_rows.get(identity)
+        if new_metrics is None:
+            continue
+        label = ', '.join(f'{field}={value}' for field, value in identity)
+        for field, old in base_metrics.items():
+            if field not in new_metrics or (wanted and field not in wanted):
+                continue
+            value = new_metrics[field]
+            compared += 1
+            if old == value:
+                change = 0.0
+            elif old == 0:
+                change = float('inf')
+            else:
+                change = (value - old) / abs(old) * 100
+            worse = -change * direction(field) > args.threshold
+            regressions += worse
+            if worse or args.all:
+                rows.append((label, field, f'{old:,.3f}', f'{value:,.3f}', f'{change:+.1f}%',
+                             'REGRESSION' if worse else ''))
+
+    print(f"base: {describe(base)}")
+    print(f"new:  {describe(new)}")
+    unmatched = len(set(base_rows) ^ set(new_rows))
+    if unmatched:
+        print(f"{unmatched} row(s) appear in only one of the files and were skipped")
+    if rows:
+        print_table(('row', 'metric', 'base', 'new', 'change', ''), rows)
+    print(f"{compared} metric(s) compared, {regressions} regressed by more than {args.threshold:g}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+"""
+End-to-end load test: virtual users register, log in, then repeatedly upload
+a document, list their files, sign the document, download its signature and
+verify it, all through the real URLs and forms.
+
+By default requests go through Django's test Client against a throwaway test
+database (one Client per virtual user, --concurrency users at a time on
+threads). Pass --url to drive a running server instead, e.g. gunicorn in
+front of PostgreSQL; that server's database and media directory get the
+benchmark users and files.
+
+    python -m benchmarks.load_test --users 16 --concurrency 4 --iterations 5 --size 256K --json load.json
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --users 64 --concurrency 16
+"""
+import argparse
+import http.cookiejar
+import math
+import os
+import random
+import re
+import statistics
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import Timer, dump_json, format_size, parse_size, print_table, setup_django
+
+OPERATIONS = ('register', 'login', 'upload', 'list', 'sign', 'download_signature', 'verify')
+FILE_ID = re.compile(r'data-file-id="(\d+)"')
+
+
+class RequestFailed(Exception):
+    pass
+
+
+class ClientSession:
+    # One browser, through Django's test Client; CSRF isn't enforced there
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, b''.join(response) if response.streaming else response.content
+
+    def post(self, path, data, files=None):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        data = dict(data)
+        for field, (name, content) in (files or {}).items():
+            data[field] = SimpleUploadedFile(name, content)
+        response = self.client.post(path, data)
+        return response.status_code, response.content
+
+
+class _NoRedirects(urllib.request.HTTPRedirectHandler):
+    # Report redirects like the test Client does, instead of following them
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    # One browser against a live server: keeps cookies and sends the CSRF token with every POST
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirects)
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request, timeout=300) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def get(self, path):
+        return self._open(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, data, files=None):
+        headers = {'Referer': self.base_url + path}
+        token = next((c.value for c in self.cookies if c.name == 'csrftoken'), None)
+        if token:
+            headers['X-CSRFToken'] = token
+        if files:
+            boundary = uuid.uuid4().hex
+            body = bytearray()
+            for field, value in data.items():
+                body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"\r\n\r\n'
+                         f'{value}\r\n').encode()
+            for field, (name, content) in files.items():
+                body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{name}"\r\n'
+                         'Content-Type: application/octet-stream\r\n\r\n').encode()
+                body += content + b'\r\n'
+            body += f'--{boundary}--\r\n'.encode()
+            headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+        else:
+            body = urllib.parse.urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        return self._open(urllib.request.Request(self.base_url + path, data=bytes(body), headers=headers))
+
+
+def percentile(latencies, fraction):
+    # Nearest rank of a sorted list
+    return latencies[max(math.ceil(len(latencies) * fraction) - 1, 0)]
+
+
+def use_file_test_database():
+    # The in-memory SQLite test database locks whole tables against other threads;
+    # a file lets concurrent users wait on each other instead of failing
+    from django.db import connection
+    if connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(prefix='bench-db-'), 'test.sqlite3')
+        connection.settings_dict['OPTIONS'].update({'timeout': 60, 'init_command': 'PRAGMA journal_mode=WAL'})
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {name: [] for name in OPERATIONS}
+        self.errors = {name: 0 for name in OPERATIONS}
+
+    def call(self, operation, fn, *args):
+        # Times one operation; any failure is counted and ends this virtual user's run
+        with Timer() as t:
+            try:
+                result = fn(*args)
+            except Exception:
+                with self.lock:
+                    self.errors[operation] += 1
+                raise
+        with self.lock:
+            self.latencies[operation].append(t.elapsed)
+        return result
+
+    def summary(self, elapsed):
+        results = []
+        for operation in OPERATIONS:
+            latencies = sorted(self.latencies[operation])
+            result = {'operation': operation, 'requests': len(latencies), 'errors': self.errors[operation]}
+            if latencies:
+                result.update({
+                    'requests_per_s': len(latencies) / elapsed,
+                    'mean_ms': statistics.fmean(latencies) * 1000,
+                    'p50_ms': statistics.median(latencies) * 1000,
+                    'p95_ms': percentile(latencies, 0.95) * 1000,
+                    'p99_ms': percentile(latencies, 0.99) * 1000,
+                })
+            results.append(result)
+        return results
+
+
+def expect(status, body, allowed=(200, 302)):
+    if status not in allowed:
+        raise RequestFailed(f"HTTP {status}: {body[:200]!r}")
+    return body
+
+
+def register(session, username, password):
+    session.get('/register/')  # sets the CSRF cookie, as a browser would get it
+    status, body = session.post('/register/', {'username': username, 'email': f'{username}@example.com',
+                                               'password1': password, 'password2': password})
+    # The form re-renders with 200 when it doesn't validate
+    expect(status, body, (302,))
+
+
+def login(session, username, password):
+    session.get('/login/')
+    status, body = session.post('/login/', {'username': username, 'password': password})
+    expect(status, body, (302,))
+
+
+def upload(session, name, document):
+    expect(*session.post('/upload/', {}, {'uploaded_files': (name, document)}), (302,))
+
+
+def list_files(session):
+    return [int(i) for i in FILE_ID.findall(expect(*session.get('/uploads/'), (200,)).decode())]
+
+
+def sign(session, file_id):
+    expect(*session.post('/sign-file/', {'file_id': file_id}), (302,))
+
+
+def download_signature(session, file_id):
+    return expect(*session.get(f'/download-signature/{file_id}/'), (200,))
+
+
+def verify(session, name, document, signature):
+    expect(*session.post('/verify/', {}, {'original_file': (name, document), 'signature_file': ('sig.json', signature)}),
+           (302,))
+    # The outcome is a flashed message on the page the view redirects to
+    page = expect(*session.get('/verify/'), (200,))
+    if b'Signature is VALID' not in page:
+        raise RequestFailed("The signature did not verify")
+
+
+def virtual_user(make_session, recorder, index, iterations, document, run_id):
+    session = make_session()
+    username = f'load-{run_id}-{index}'
+    password = f'pw-{uuid.uuid4().hex}'
+    try:
+        recorder.call('register', register, session, username, password)
+        recorder.call('login', login, session, username, password)
+        for i in range(iterations):
+            name = f'doc-{index}-{i}.bin'
+            # A distinct document per upload, so content-addressed storage can't dedupe them
+            content = document + f'{username}:{i}'.encode()
+            known = set(list_files(session))
+            recorder.call('upload', upload, session, name, content)
+            new = set(recorder.call('list', list_files, session)) - known
+            if len(new) != 1:
+                raise RequestFailed(f"Expected one new file in the list, found {len(new)}")
+            file_id = new.pop()
+            recorder.call('sign', sign, session, file_id)
+            signature = recorder.call('download_signature', download_signature, session, file_id)
+            recorder.call('verify', verify, session, name, content, signature)
+    except Exception as e:
+        return f'{username}: {e}'
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Base URL of a running server (default: in-process test Client)')
+    parser.add_argument('--users', type=int, default=16, help='Virtual users, each registering a new account')
+    parser.add_argument('--concurrency', type=int, default=4, help='Virtual users running at the same time')
+    parser.add_argument('--iterations', type=int, default=3, help='Upload, sign and verify rounds per user')
+    parser.add_argument('--size', default='256K', help='Size of the uploaded documents, e.g. 64K, 16M')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the document generator')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    size = parse_size(args.size)
+    document = random.Random(args.seed).randbytes(size)
+    run_id = uuid.uuid4().hex[:8]
+
+    def run(make_session):
+        recorder = Recorder()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            with Timer() as total:
+                failures = list(pool.map(
+                    lambda i: virtual_user(make_session, recorder, i, args.iterations, document, run_id),
+                    range(args.users),
+                ))
+        return recorder.summary(total.elapsed), total.elapsed, [f for f in failures if f]
+
+    if args.url:
+        results, elapsed, failures = run(lambda: HttpSession(args.url))
+    else:
+        setup_django()
+        from benchmarks.common import test_environment
+        use_file_test_database()
+        with test_environment():
+            results, elapsed, failures = run(ClientSession)
+
+    for failure in failures[:10]:
+        print(f"Failed: {failure}")
+    print(f"{args.users} users, concurrency {args.concurrency}, {args.iterations} iterations, "
+          f"{format_size(size)} documents, {elapsed:.1f}s against {args.url or 'the test client'}")
+    rows = [(r['operation'], r['requests'], r['errors'], f"{r.get('requests_per_s', 0):.1f}",
+             f"{r.get('p50_ms', 0):.1f} ms", f"{r.get('p95_ms', 0):.1f} ms", f"{r.get('p99_ms', 0):.1f} ms")
+            for r in results]
+    print_table(('operation', 'requests', 'errors', 'req/s', 'p50', 'p95', 'p99'), rows)
+    if args.json:
+        dump_json(args.json, {
+            'benchmark': 'load_test', 'target': 'http' if args.url else 'client', 'users': args.users,
+            'concurrency': args.concurrency, 'iterations': args.iterations, 'size': size, 'seconds': elapsed,
+            'failed_users': len(failures), 'results': results,
+        })
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,11 @@
 from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import UploadedFile,UserKeyPair
-from .utils import create_or_update_user_keys
+from .models import UploadedFile,UserKeyPair,KeyRotation,Job
 
 class UploadedFileAdmin(admin.ModelAdmin):
     list_display = ('__str__', 'owner', 'upload_date','signature')
-    fields = ('uploaded_file', 'owner', 'upload_date','signature')
-
-    def delete_model(self, request, obj):
-        obj.uploaded_file.delete(save=False)
-        super().delete_model(request, obj)
-
-    def delete_queryset(self, request, queryset):
-        for obj in queryset:
-            obj.uploaded_file.delete(save=False)
-        super().delete_queryset(request, queryset)
+    fields = ('uploaded_file', 'original_name', 'owner', 'upload_date','signature')
 
 class CustomUserAdmin(BaseUserAdmin):
     actions = ['regenerate_key_pairs']
@@ -23,16 +13,26 @@ class CustomUserAdmin(BaseUserAdmin):
     @admin.action(description='Regenerate key pairs for selected users')
     def regenerate_key_pairs(self, request, queryset):
         """
-        Admin action to regenerate key pairs for selected users.
+        Admin action to queue a key pair regeneration for selected users.
+        The work is done by `manage.py rotate_keys --pending`, not in the request.
         """
-        count = 0
-        for user in queryset:
-            create_or_update_user_keys(user)
-            count += 1
-        
-        self.message_user(request, f'{count} user(s) had their key pairs successfully regenerated.', messages.SUCCESS)
+        user_ids = list(queryset.values_list('pk', flat=True))
+        rotation = KeyRotation.objects.create(requested_by=request.user, user_ids=user_ids)
+
+        self.message_user(request, f'Key pair regeneration for {len(user_ids)} user(s) was queued as rotation #{rotation.pk}.', messages.SUCCESS)
+
+class KeyRotationAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'requested_by', 'status', 'processed', 'total', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('requested_by', 'user_ids', 'status', 'total', 'processed', 'created_at', 'started_at', 'finished_at', 'error')
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'kind', 'status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
 
 admin.site.unregister(User)
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(UploadedFile, UploadedFileAdmin)
-admin.site.register(UserKeyPair)
\ No newline at end of file
+admin.site.register(UserKeyPair)
+admin.site.register(KeyRotation, KeyRotationAdmin)
+admin.site.register(Job, JobAdmin)
\ No newline at end of file
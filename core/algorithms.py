@@ -0,0 +1,164 @@
+# pycryptodome is imported where it's used: loading its native modules is a large part of
+# process startup, and most management commands never sign anything. See load_backends().
+
+RSA_PKCS1_SHA256 = 'rsa'
+ED25519 = 'ed25519'
+ECDSA_P256 = 'ecdsa-p256'
+
+
+class PrehashedSHA256:
+    """
+    Wraps an already computed SHA-256 digest so pycryptodome's signature
+    schemes can sign/verify it without re-hashing the message.
+    """
+    oid = '2.16.840.1.101.3.4.2.1'  # SHA256.new().oid
+    digest_size = 32
+
+    def __init__(self, digest: bytes):
+        if len(digest) != self.digest_size:
+            raise ValueError("A SHA-256 digest must be 32 bytes long.")
+        self._digest = digest
+
+    def digest(self) -> bytes:
+        return self._digest
+
+    def hexdigest(self) -> str:
+        return self._digest.hex()
+
+
+class SignatureAlgorithm:
+    """
+    One way of signing a document's SHA-256 digest. Keys are exchanged as PEM
+    bytes, as stored on UserKeyPair, and used as imported pycryptodome keys.
+    """
+    name = None
+    label = None
+
+    def generate(self, key_size=None):
+        # Returns (private key PEM, public key PEM) as bytes
+        raise NotImplementedError
+
+    def import_key(self, data):
+        raise NotImplementedError
+
+    def owns(self, key) -> bool:
+        # Whether an imported key object belongs to this algorithm
+        raise NotImplementedError
+
+    def sign(self, private_key, digest: bytes) -> bytes:
+        raise NotImplementedError
+
+    def verify(self, public_key, digest: bytes, signature: bytes) -> bool:
+        raise NotImplementedError
+
+
+class RSAPKCS1SHA256(SignatureAlgorithm):
+    name = RSA_PKCS1_SHA256
+    label = 'RSA PKCS#1 v1.5 with SHA-256'
+
+    def generate(self, key_size=None):
+        from Crypto.PublicKey import RSA
+        key = RSA.generate(key_size or 2048)
+        return key.export_key(), key.publickey().export_key()
+
+    def import_key(self, data):
+        from Crypto.PublicKey import RSA
+        return RSA.import_key(data)
+
+    def owns(self, key):
+        from Crypto.PublicKey import RSA
+        return isinstance(key, RSA.RsaKey)
+
+    def sign(self, private_key, digest):
+        from Crypto.Signature import pkcs1_15
+        return pkcs1_15.new(private_key).sign(PrehashedSHA256(digest))
+
+    def verify(self, public_key, digest, signature):
+        from Crypto.Signature import pkcs1_15
+        try:
+            pkcs1_15.new(public_key).verify(PrehashedSHA256(digest), signature)
+            return True
+        except (ValueError, TypeError):
+            return False
+
+
+class _ECCAlgorithm(SignatureAlgorithm):
+    curve = None
+
+    def generate(self, key_size=None):
+        # key_size only applies to RSA; the curve fixes the key size here
+        from Crypto.PublicKey import ECC
+        key = ECC.generate(curve=self.curve)
+        return key.export_key(format='PEM').encode(), key.public_key().export_key(format='PEM').encode()
+
+    def import_key(self, data):
+        from Crypto.PublicKey import ECC
+        return ECC.import_key(data)
+
+    def owns(self, key):
+        from Crypto.PublicKey import ECC
+        return isinstance(key, ECC.EccKey) and key.curve == self.curve
+
+
+class Ed25519(_ECCAlgorithm):
+    name = ED25519
+    label = 'Ed25519'
+    curve = 'Ed25519'
+
+    # Pure Ed25519 over the 32-byte SHA-256 digest, so documents are still hashed once, in chunks
+    def sign(self, private_key, digest):
+        from Crypto.Signature import eddsa
+        return eddsa.new(private_key, 'rfc8032').sign(digest)
+
+    def verify(self, public_key, digest, signature):
+        from Crypto.Signature import eddsa
+        try:
+            eddsa.new(public_key, 'rfc8032').verify(digest, signature)
+            return True
+        except (ValueError, TypeError):
+            return False
+
+
+class ECDSAP256(_ECCAlgorithm):
+    name = ECDSA_P256
+    label = 'ECDSA P-256 with SHA-256'
+    curve = 'NIST P-256'
+
+    def sign(self, private_key, digest):
+        from Crypto.Signature import DSS
+        return DSS.new(private_key, 'fips-186-3').sign(PrehashedSHA256(digest))
+
+    def verify(self, public_key, digest, signature):
+        from Crypto.Signature import DSS
+        try:
+            DSS.new(public_key, 'fips-186-3').verify(PrehashedSHA256(digest), signature)
+            return True
+        except (ValueError, TypeError):
+            return False
+
+
+ALGORITHMS = {algorithm.name: algorithm for algorithm in (RSAPKCS1SHA256(), Ed25519(), ECDSAP256())}
+ALGORITHM_CHOICES = [(algorithm.name, algorithm.label) for algorithm in ALGORITHMS.values()]
+
+
+def get_algorithm(name) -> SignatureAlgorithm:
+    try:
+        return ALGORITHMS[name]
+    except KeyError:
+        raise ValueError(f"Unknown signature algorithm '{name}'.") from None
+
+
+def algorithm_for_key(key) -> SignatureAlgorithm:
+    for algorithm in ALGORITHMS.values():
+        if algorithm.owns(key):
+            return algorithm
+    raise ValueError(f"No signature algorithm handles {type(key).__name__} keys.")
+
+
+def load_backends():
+    # Imports every algorithm's pycryptodome modules, e.g. in a worker before it takes requests
+    import Crypto.PublicKey.ECC
+    import Crypto.PublicKey.RSA
+    import Crypto.Signature.DSS
+    import Crypto.Signature.eddsa
+    import Crypto.Signature.pkcs1_15
@@ -0,0 +1,135 @@
+import base64
+import json
+import struct
+from collections import namedtuple
+
+from .algorithms import ECDSA_P256, ED25519, RSA_PKCS1_SHA256
+from .merkle import read_signed_tree, valid_chunk_size
+
+# Binary signature container, version 1. All integers are big-endian:
+#
+#   magic "DSIG" | version u8 | algorithm id u8 | mode u8 | flags u8 (0)
+#   | key fingerprint 32 bytes | signer length u16 | signature length u16
+#   | signer (UTF-8) | signature
+#   [Merkle mode only: chunk size u32 | file size u64 | leaf count u32 | leaves, 32 bytes each]
+MAGIC = b'DSIG'
+VERSION = 1
+HEADER = struct.Struct('>4sBBBB32sHH')
+MERKLE_HEADER = struct.Struct('>IQI')
+LEAF_SIZE = 32
+
+# Ids are part of the format; never renumber them
+ALGORITHM_IDS = {RSA_PKCS1_SHA256: 1, ED25519: 2, ECDSA_P256: 3}
+ALGORITHMS_BY_ID = {algorithm_id: name for name, algorithm_id in ALGORITHM_IDS.items()}
+MODE_DIGEST, MODE_MERKLE = 0, 1
+
+# A parsed signature file in either format. `fingerprint` is None for JSON files; in
+# binary files `signature` and the Merkle leaves are memoryviews into the input.
+SignatureFile = namedtuple('SignatureFile', ['signer', 'algorithm', 'mode', 'fingerprint', 'signature', 'merkle'])
+
+
+class ContainerError(ValueError):
+    pass
+
+
+def encode_container(signer: str, algorithm: str, fingerprint: str, signature: bytes, merkle=None) -> bytes:
+    """
+    Packs a signature into the binary container. `fingerprint` is the hex
+    key_fingerprint() of the signing key and `merkle`, for Merkle-mode
+    signatures, the (chunk_size, size, hex leaves) of the signed tree.
+    """
+    signer_bytes = signer.encode('utf-8')
+    parts = [HEADER.pack(
+        MAGIC, VERSION, ALGORITHM_IDS[algorithm], MODE_MERKLE if merkle else MODE_DIGEST, 0,
+        bytes.fromhex(fingerprint), len(signer_bytes), len(signature),
+    ), signer_bytes, signature]
+    if merkle:
+        chunk_size, size, leaves = merkle
+        parts.append(MERKLE_HEADER.pack(chunk_size, size, len(leaves)))
+        parts.extend(bytes.fromhex(leaf) for leaf in leaves)
+    return b''.join(parts)
+
+
+def decode_container(data) -> SignatureFile:
+    """
+    Parses a binary container without copying the signature or leaves.
+    Raises ContainerError when the data is not a valid version 1 container.
+    """
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise ContainerError("The signature file is truncated.")
+    magic, version, algorithm_id, mode, _, fingerprint, signer_length, signature_length = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ContainerError("Not a binary signature file.")
+    if version != VERSION:
+        raise ContainerError(f"Unsupported signature file version {version}.")
+    if algorithm_id not in ALGORITHMS_BY_ID or mode not in (MODE_DIGEST, MODE_MERKLE):
+        raise ContainerError("The signature file names an unknown algorithm or mode.")
+
+    offset = HEADER.size
+    end = offset + signer_length + signature_length
+    if len(view) < end:
+        raise ContainerError("The signature file is truncated.")
+    try:
+        signer = str(view[offset:offset + signer_length], 'utf-8')
+    except UnicodeDecodeError:
+        raise ContainerError("The signer name is not valid UTF-8.") from None
+    signature = view[offset + signer_length:end]
+
+    merkle = None
+    if mode == MODE_MERKLE:
+        if len(view) < end + MERKLE_HEADER.size:
+            raise ContainerError("The signature file is truncated.")
+        chunk_size, size, count = MERKLE_HEADER.unpack_from(view, end)
+        if not valid_chunk_size(chunk_size) or count != max(1, -(-size // chunk_size)):
+            raise ContainerError("The signature file's Merkle tree is malformed.")
+        offset = end + MERKLE_HEADER.size
+        end = offset + count * LEAF_SIZE
+        if len(view) < end:
+            raise ContainerError("The signature file is truncated.")
+        merkle = (chunk_size, size, [view[i:i + LEAF_SIZE] for i in range(offset, end, LEAF_SIZE)])
+    if len(view) != end:
+        raise ContainerError("The signature file has trailing data.")
+
+    return SignatureFile(signer, ALGORITHMS_BY_ID[algorithm_id], 'merkle' if merkle else 'digest',
+                         fingerprint.hex(), signature, merkle)
+
+
+def signature_json(signer: str, algorithm: str, mode: str, signature: str, merkle=None) -> dict:
+    """
+    The JSON signature file of a signed document; `signature` is base64 and
+    `merkle` is as for encode_container().
+    """
+    signature_data = {
+        'signer_username': signer,
+        'algorithm': algorithm,
+        'mode': mode,
+        'signature': signature
+    }
+    if merkle:
+        signature_data['merkle'] = {
+            'hash': 'sha256',
+            'chunk_size': merkle[0],
+            'size': merkle[1],
+            'leaves': merkle[2],
+        }
+    return signature_data
+
+
+def read_signature_file(data) -> SignatureFile:
+    """
+    Parses a downloaded signature file in either format. JSON files raise
+    json.JSONDecodeError or KeyError when malformed, binary ones ContainerError.
+    Algorithm and mode are None for JSON files that predate them.
+    """
+    if bytes(data[:len(MAGIC)]) == MAGIC:
+        return decode_container(data)
+
+    signature_data = json.loads(data)
+    signer, signature = signature_data['signer_username'], signature_data['signature']
+    merkle = None
+    if signature_data.get('mode') == 'merkle':
+        chunk_size, size, leaves = read_signed_tree(signature_data.get('merkle'))
+        merkle = (chunk_size, size, leaves)
+    return SignatureFile(signer, signature_data.get('algorithm'), signature_data.get('mode'),
+                         None, base64.b64decode(signature), merkle)
@@ -0,0 +1,143 @@
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_etags
+
+from .export import aiter_sync
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+ASGI_BLOCK_SIZE = 512 * 1024
+
+
+class _FileRange:
+    """
+    Read-only view of `length` bytes of `file` from `start`. fileno() is kept,
+    so a WSGI server's file_wrapper can still sendfile() it: the descriptor
+    is positioned at `start` and Content-Length bounds the copy.
+    """
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _blocks(body):
+    try:
+        yield from iter(lambda: body.read(ASGI_BLOCK_SIZE), b'')
+    finally:
+        body.close()
+
+
+def parse_range(header, size):
+    """
+    Returns the (start, end) byte positions, end inclusive, of a single-range
+    Range header; None when the whole file should be sent (no header, a header
+    we don't understand, or several ranges); or False when it can't be satisfied.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        # An invalid range set is ignored rather than refused (RFC 9110, 14.2)
+        return None
+    if start >= size:
+        return False
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def _offload_header(field_file):
+    # Hands the transfer to the front-end web server; None when not configured or not possible
+    offload = settings.DOWNLOAD_OFFLOAD
+    if offload == 'x-accel-redirect':
+        return 'X-Accel-Redirect', settings.DOWNLOAD_ACCEL_PREFIX.rstrip('/') + '/' + quote(field_file.name)
+    if offload == 'x-sendfile':
+        try:
+            return 'X-Sendfile', field_file.storage.path(field_file.name)
+        except NotImplementedError:
+            return None
+    return None
+
+
+def serve_file(request, field_file, filename, size=None, sha256=None, last_modified=None):
+    """
+    Sends a stored file as an attachment. The transfer is handed off through
+    X-Accel-Redirect or X-Sendfile when DOWNLOAD_OFFLOAD is set; otherwise it
+    is served from here with single-range requests, so interrupted downloads
+    can resume. The ETag is the content digest, and conditional requests get
+    304/412 without opening the file.
+    """
+    headers = {'Accept-Ranges': 'bytes', 'Cache-Control': 'private'}
+    etag = f'"{sha256}"' if sha256 else None
+    if etag:
+        headers['ETag'] = etag
+    if last_modified is not None:
+        last_modified = int(last_modified.timestamp())
+        headers['Last-Modified'] = http_date(last_modified)
+
+    # The 304 copies its validators from this response; it comes back unchanged when no precondition applies
+    unconditional = HttpResponse(headers=headers)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified, response=unconditional)
+    if response is not unconditional:
+        return response
+
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    headers['Content-Disposition'] = content_disposition_header(True, filename)
+
+    offload = _offload_header(field_file)
+    if offload:
+        # The web server handles Range and streams the file itself
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response[offload[0]] = offload[1]
+        return response
+
+    if size is None:
+        size = field_file.storage.size(field_file.name)
+    status, start, length = 200, 0, size
+    range_header = request.META.get('HTTP_RANGE')
+    # A stale If-Range means the client's partial copy is of other content: send it all
+    if range_header and (not request.META.get('HTTP_IF_RANGE')
+                         or (etag and etag in parse_etags(request.META['HTTP_IF_RANGE']))):
+        byte_range = parse_range(range_header, size)
+        if byte_range is False:
+            headers['Content-Range'] = f'bytes */{size}'
+            return HttpResponse(status=416, headers=headers)
+        if byte_range:
+            status, start, length = 206, byte_range[0], byte_range[1] - byte_range[0] + 1
+            headers['Content-Range'] = f'bytes {start}-{byte_range[1]}/{size}'
+
+    body = _FileRange(field_file.storage.open(field_file.name, 'rb'), start, length)
+    if isinstance(request, ASGIRequest):
+        # Django would read a sync FileResponse into memory in full before sending it under ASGI
+        response = StreamingHttpResponse(aiter_sync(_blocks(body)), status=status,
+                                         content_type=content_type, headers=headers)
+    else:
+        response = FileResponse(body, status=status, content_type=content_type, headers=headers)
+    response['Content-Length'] = length
+    return response
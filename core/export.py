@@ -0,0 +1,87 @@
+import json
+import os
+import zipfile
+
+from asgiref.sync import sync_to_async
+
+from .models import UploadedFile
+from .utils import HASH_CHUNK_SIZE
+
+EXPORT_QUERY_CHUNK_SIZE = 200
+
+
+class _ZipOutput:
+    """
+    Write-only sink for ZipFile. Having no tell() or seek(), it makes ZipFile
+    stream entries with data descriptors instead of seeking back to patch
+    headers; whatever was written is handed out with take().
+    """
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _entry_names(uploaded_file):
+    # File ids keep entries unique when several uploads share a name
+    name = str(uploaded_file).replace('/', '_') or 'file'
+    stem = os.path.splitext(name)[0]
+    return f"{uploaded_file.pk}-{name}", f"{uploaded_file.pk}-{stem}.json"
+
+
+def iter_signed_zip(user, signature_data, chunk_size: int = HASH_CHUNK_SIZE):
+    """
+    Yields a ZIP archive of `user`'s signed files, each followed by its
+    signature JSON, as it is being written. Rows come from a server-side
+    iterator and documents are copied from storage in `chunk_size` pieces, so
+    memory use and time to first byte don't depend on the number of files.
+
+    `signature_data(uploaded_file)` builds the JSON document of one file.
+    """
+    files = UploadedFile.objects.filter(
+        owner=user, signing_status=UploadedFile.SIGNING_DONE,
+    ).order_by('pk').iterator(chunk_size=EXPORT_QUERY_CHUNK_SIZE)
+
+    output = _ZipOutput()
+    with zipfile.ZipFile(output, 'w', allowZip64=True) as archive:
+        for uploaded_file in files:
+            document_name, signature_name = _entry_names(uploaded_file)
+            entry = zipfile.ZipInfo(document_name, uploaded_file.upload_date.timetuple()[:6])
+            # Documents are usually compressed already; storing them keeps the export I/O bound
+            entry.compress_type = zipfile.ZIP_STORED
+            try:
+                uploaded_file.uploaded_file.open('rb')
+                with uploaded_file.uploaded_file as source, archive.open(entry, 'w', force_zip64=True) as target:
+                    for chunk in source.chunks(chunk_size):
+                        target.write(chunk)
+                        yield output.take()
+            except OSError:
+                # A document missing from storage shouldn't abort the whole export
+                continue
+
+            archive.writestr(
+                zipfile.ZipInfo(signature_name, entry.date_time),
+                json.dumps(signature_data(uploaded_file), indent=4),
+                compress_type=zipfile.ZIP_DEFLATED,
+            )
+            yield output.take()
+    yield output.take()
+
+
+async def aiter_sync(iterator):
+    # Lets an ASGI StreamingHttpResponse consume a sync generator part by part
+    # instead of buffering it; each step runs in the thread that owns the DB connection
+    step = sync_to_async(lambda: next(iterator, None))
+    while (part := await step()) is not None:
+        if part:
+            yield part
@@ -0,0 +1,105 @@
+import logging
+import time
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def job_handler(kind):
+    """
+    Registers the decorated function as the handler for jobs of `kind`.
+    The job payload is passed to it as keyword arguments.
+    """
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, **payload):
+    if kind not in _handlers:
+        raise ValueError(f"No job handler is registered for '{kind}'.")
+    return Job.objects.create(kind=kind, payload=payload)
+
+
+def claim_next_job(kinds=None):
+    """
+    Marks the oldest queued job as running and returns it, or returns None if
+    the queue is empty. Safe to call from many worker processes at once.
+    """
+    queryset = Job.objects.filter(status=Job.STATUS_QUEUED)
+    if kinds:
+        queryset = queryset.filter(kind__in=kinds)
+    for job in queryset.order_by('created_at', 'pk')[:10]:
+        with transaction.atomic():
+            # Only the worker whose update flips the status gets the job
+            claimed = Job.objects.filter(pk=job.pk, status=Job.STATUS_QUEUED).update(
+                status=Job.STATUS_RUNNING, started_at=timezone.now(), attempts=job.attempts + 1,
+            )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_job(job):
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No job handler is registered for '{job.kind}'.")
+        handler(**job.payload)
+    except Exception as e:
+        logger.exception("Job %s failed", job)
+        job.status = Job.STATUS_FAILED
+        job.error = repr(e)
+    else:
+        job.status = Job.STATUS_DONE
+        job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def requeue_stale_jobs(older_than, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Puts jobs left running by a worker that died back on the queue, and fails
+    the ones that have already been started `max_attempts` times, since they
+    may be what kills the worker. Returns the number of requeued jobs.
+    """
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, started_at__lt=timezone.now() - older_than)
+    stale.filter(attempts__gte=max_attempts).update(
+        status=Job.STATUS_FAILED, finished_at=timezone.now(),
+        error=f"Abandoned by its worker {max_attempts} time(s).",
+    )
+    return stale.filter(attempts__lt=max_attempts).update(status=Job.STATUS_QUEUED)
+
+
+def work(kinds=None, poll_interval=1.0, should_stop=lambda: False, requeue_after=None,
+         max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Runs queued jobs until should_stop() returns True, sleeping for
+    `poll_interval` seconds whenever the queue is empty. With `requeue_after`
+    (a timedelta), jobs abandoned by dead workers are requeued along the way,
+    checked at most once a minute.
+    """
+    next_requeue = 0
+    while not should_stop():
+        close_old_connections()
+        if requeue_after is not None and time.monotonic() >= next_requeue:
+            requeued = requeue_stale_jobs(requeue_after, max_attempts)
+            if requeued:
+                logger.warning("Requeued %d stale job(s)", requeued)
+            next_requeue = time.monotonic() + min(60, requeue_after.total_seconds())
+        job = claim_next_job(kinds)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import UploadedFile
+from core.utils import digest_file
+from core.workers import default_worker_count
+
+
+class Command(BaseCommand):
+    help = "Computes and stores the content digests and size of files uploaded before they were recorded."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Hashing threads (default: one per CPU core). hashlib releases the GIL.')
+        parser.add_argument('--blake2b', action='store_true', default=getattr(settings, 'UPLOAD_BLAKE2B', False),
+                            help='Also compute BLAKE2b digests.')
+
+    def handle(self, *args, **options):
+        blake2b = options['blake2b']
+        pending = UploadedFile.objects.filter(sha256__isnull=True).order_by('pk')
+        total = pending.count()
+        if not total:
+            self.stdout.write("All files already have digests.")
+            return
+
+        def hash_one(uploaded_file):
+            try:
+                uploaded_file.sha256, uploaded_file.blake2b, uploaded_file.size = digest_file(
+                    uploaded_file.uploaded_file, blake2b=blake2b,
+                )
+                return uploaded_file
+            except OSError as e:
+                self.stderr.write(f"Skipping '{uploaded_file}' (#{uploaded_file.pk}): {e}")
+                return None
+
+        done, last_pk = 0, 0
+        with ThreadPoolExecutor(max_workers=options['workers'] or default_worker_count()) as pool:
+            while True:
+                # Keyset batches so rows that fail to hash are not picked up again
+                batch = list(pending.filter(pk__gt=last_pk).only('pk', 'uploaded_file')[:options['batch_size']])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                hashed = [f for f in pool.map(hash_one, batch) if f is not None]
+                UploadedFile.objects.bulk_update(hashed, ['sha256', 'blake2b', 'size'])
+                done += len(batch)
+                self.stdout.write(f"  {done}/{total}")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled digests for {done} file(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.upload_sessions import discard_session, expired_sessions
+
+
+class Command(BaseCommand):
+    help = "Deletes resumable uploads older than UPLOAD_SESSION_TTL together with their partially written files."
+
+    def handle(self, *args, **options):
+        count = 0
+        for session in expired_sessions().iterator():
+            discard_session(session)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} abandoned upload(s)."))
@@ -0,0 +1,75 @@
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import PooledKeyPair
+from core.utils import current_key_version, default_algorithm, encrypt_key, generate_keys, key_pool_status
+from core.workers import default_worker_count, process_pool
+
+
+class Command(BaseCommand):
+    help = ("Pre-generates encrypted key pairs of the configured SIGNING_ALGORITHM so user registration "
+            "can claim one instead of generating it inline.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', type=int, default=getattr(settings, 'KEY_POOL_SIZE', 50),
+                            help='Number of key pairs to keep in the pool.')
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'KEY_POOL_REFILL_BATCH', 0),
+                            help='Most key pairs generated per refill cycle (default: 4 per worker).')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Key generation processes (default: one per CPU core).')
+        parser.add_argument('--watch', action='store_true',
+                            help='Keep running and top the pool up every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=getattr(settings, 'KEY_POOL_REFILL_INTERVAL', 10),
+                            help='Seconds between refill cycles with --watch.')
+        parser.add_argument('--status', action='store_true', help='Print the pool depth and exit.')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            status = key_pool_status()
+            self.stdout.write(f"key_pool_algorithm {status['algorithm']}")
+            self.stdout.write(f"key_pool_depth {status['depth']}")
+            self.stdout.write(f"key_pool_target {status['target']}")
+            return
+
+        workers = options['workers'] or default_worker_count()
+        batch_size = options['batch_size'] or workers * 4
+        target = options['target']
+
+        with process_pool(workers) as pool:
+            while True:
+                self.refill(pool, target, batch_size, until_full=not options['watch'])
+                if not options['watch']:
+                    break
+                time.sleep(options['interval'])
+
+    def refill(self, pool, target, batch_size, until_full):
+        algorithm = default_algorithm()
+        depth = PooledKeyPair.objects.filter(algorithm=algorithm).count()
+        missing = target - depth
+        if missing <= 0:
+            return
+
+        started = time.perf_counter()
+        generated = 0
+        while missing > 0:
+            count = min(batch_size, missing)
+            key_size = getattr(settings, 'KEY_SIZE', 2048)
+            pairs = pool.map(partial(generate_keys, algorithm=algorithm), [key_size] * count)
+            PooledKeyPair.objects.bulk_create([
+                PooledKeyPair(algorithm=algorithm, public_key=public_key.decode('utf-8'),
+                              private_key_encrypted=encrypt_key(private_key), key_version=current_key_version())
+                for private_key, public_key in pairs
+            ])
+            generated += count
+            missing -= count
+            if not until_full:
+                break
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Generated {generated} key pair(s) in {elapsed:.1f}s ({generated / elapsed:.1f}/s), "
+            f"pool depth {depth + generated}/{target} ({algorithm})"
+        )
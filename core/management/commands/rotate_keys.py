@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import KeyRotation
+from core.rotation import claim_rotation, claimable_rotation_ids, run_key_rotation
+from core.workers import process_pool
+
+
+class Command(BaseCommand):
+    help = "Regenerates user key pairs in parallel. Interrupted rotations resume where they stopped."
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--all', action='store_true', help='Rotate the key pairs of every user.')
+        target.add_argument('--users', nargs='+', type=int, metavar='USER_ID', help='Rotate these users only.')
+        target.add_argument('--pending', action='store_true',
+                            help='Run rotations queued from the admin, and resume abandoned ones.')
+        target.add_argument('--resume', type=int, metavar='ROTATION_ID', help='Resume one rotation.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Key generation processes (default: one per CPU core).')
+        parser.add_argument('--stale-after', type=int, default=900, metavar='SECONDS',
+                            help='Treat a running rotation as abandoned once it has not written a batch '
+                                 'for this long (default: 900).')
+
+    def handle(self, *args, **options):
+        stale_after = options['stale_after']
+        if options['all']:
+            rotation_ids = [KeyRotation.objects.create().pk]
+        elif options['users']:
+            rotation_ids = [KeyRotation.objects.create(user_ids=options['users']).pk]
+        elif options['resume']:
+            rotation = KeyRotation.objects.filter(pk=options['resume']).first()
+            if rotation is None:
+                raise CommandError(f"Key rotation {options['resume']} does not exist.")
+            if rotation.status == KeyRotation.STATUS_DONE:
+                raise CommandError(f"Key rotation {rotation.pk} has already finished.")
+            rotation_ids = [rotation.pk]
+        else:
+            rotation_ids = claimable_rotation_ids(stale_after)
+
+        if not rotation_ids:
+            self.stdout.write("No key rotations to run.")
+            return
+
+        with process_pool(options['workers']) as pool:
+            for rotation_id in rotation_ids:
+                rotation = claim_rotation(rotation_id, stale_after)
+                if rotation is None:
+                    if options['resume']:
+                        raise CommandError(f"Key rotation {rotation_id} is being run by another process.")
+                    self.stdout.write(f"Skipping key rotation #{rotation_id}: another process claimed it.")
+                    continue
+                self.stdout.write(f"Running key rotation #{rotation.pk}")
+                run_key_rotation(rotation, pool, options['batch_size'], progress=self.report)
+                self.stdout.write(self.style.SUCCESS(
+                    f"Key rotation #{rotation.pk} finished: {rotation.processed}/{rotation.total} user(s)."
+                ))
+
+    def report(self, rotation):
+        percent = 100 * rotation.processed / rotation.total if rotation.total else 100
+        self.stdout.write(f"  {rotation.processed}/{rotation.total} ({percent:.0f}%)")
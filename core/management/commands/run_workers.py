@@ -0,0 +1,63 @@
+import multiprocessing
+import signal
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.jobs import DEFAULT_MAX_ATTEMPTS, requeue_stale_jobs, work
+from core.workers import default_worker_count
+
+
+def _worker_main(kinds, poll_interval, stop_event, requeue_after, max_attempts):
+    # The parent handles Ctrl+C and tells the workers to stop after their current job
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    django.setup()
+    work(kinds, poll_interval, should_stop=stop_event.is_set, requeue_after=requeue_after, max_attempts=max_attempts)
+
+
+class Command(BaseCommand):
+    help = "Starts a pool of worker processes that drain the background job queue (e.g. queued signing)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Worker processes (default: one per CPU core).')
+        parser.add_argument('--kinds', nargs='+', default=None, help='Only run jobs of these kinds.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait before checking an empty queue again.')
+        parser.add_argument('--requeue-after', type=int, default=3600,
+                            help='Requeue jobs that have been running for longer than this many seconds.')
+        parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                            help='Fail a job instead of requeuing it once it has been started this many times.')
+
+    def handle(self, *args, **options):
+        requeue_after = timedelta(seconds=options['requeue_after'])
+        requeued = requeue_stale_jobs(requeue_after, options['max_attempts'])
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+
+        processes = options['processes'] or default_worker_count()
+        stop_event = multiprocessing.Event()
+        # Children must not share the parent's open database connections
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=_worker_main, args=(options['kinds'], options['poll_interval'], stop_event,
+                                                               requeue_after, options['max_attempts']))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {processes} worker process(es). Press Ctrl+C to stop.")
+
+        def stop(*_):
+            stop_event.set()
+        signal.signal(signal.SIGTERM, stop)
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            stop()
+            self.stdout.write("Stopping workers after their current job...")
+            for worker in workers:
+                worker.join()
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.template.defaultfilters import filesizeformat
+
+from core.models import Blob, UploadedFile
+
+
+class Command(BaseCommand):
+    help = "Reports how much disk space content-addressed upload storage saves through deduplication."
+
+    def handle(self, *args, **options):
+        uploads = UploadedFile.objects.aggregate(count=Count('pk'), logical=Sum('size'))
+        blobs = Blob.objects.aggregate(count=Count('pk'), physical=Sum('size'))
+        legacy = UploadedFile.objects.exclude(uploaded_file__startswith='blobs/').count()
+        unsized = UploadedFile.objects.filter(size__isnull=True).count()
+
+        logical = uploads['logical'] or 0
+        physical = blobs['physical'] or 0
+        # Files saved before content addressing each occupy their own space
+        physical += UploadedFile.objects.exclude(uploaded_file__startswith='blobs/').aggregate(s=Sum('size'))['s'] or 0
+        ratio = logical / physical if physical else 1.0
+
+        self.stdout.write(f"Uploaded files:   {uploads['count']}")
+        self.stdout.write(f"Stored blobs:     {blobs['count']}")
+        self.stdout.write(f"Legacy files:     {legacy}")
+        self.stdout.write(f"Logical size:     {filesizeformat(logical)}")
+        self.stdout.write(f"Physical size:    {filesizeformat(physical)}")
+        self.stdout.write(f"Dedup ratio:      {ratio:.2f}x")
+        self.stdout.write(f"Bytes saved:      {filesizeformat(max(logical - physical, 0))} ({max(logical - physical, 0)} bytes)")
+        if unsized:
+            self.stdout.write(self.style.WARNING(
+                f"{unsized} file(s) have no recorded size; run `manage.py backfill_digests` for exact numbers."
+            ))
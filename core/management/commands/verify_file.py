@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.container import read_signature_file
+from core.merkle import chunk_hashes
+from core.models import UserKeyPair
+from core.utils import get_signer_key, hash_file, verify_digest_cached
+from core.verification import made_with, verify_merkle
+
+
+class Command(BaseCommand):
+    help = ("Verifies a local file against a downloaded signature file. Chunked (Merkle) signatures are "
+            "checked with the chunks hashed in parallel, and altered byte ranges are listed.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The original document.')
+        parser.add_argument('signature', help='The signature file, JSON or binary.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Hashing threads for chunked signatures (default: one per CPU core).')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['signature'], 'rb') as f:
+                signature_file = read_signature_file(f.read())
+            signer = get_signer_key(signature_file.signer)
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Can't read the signature file: {e!r}")
+        except UserKeyPair.DoesNotExist:
+            raise CommandError(f"The signer '{signature_file.signer}' was not found.")
+
+        if not made_with(signature_file, signer):
+            self.stdout.write(self.style.ERROR("INVALID: the signature was not made with the signer's current key."))
+            return
+
+        started = time.perf_counter()
+        altered = None
+        if signature_file.merkle:
+            leaves, size = chunk_hashes(options['path'], signature_file.merkle[0], options['workers'])
+            is_valid, altered = verify_merkle(signer, signature_file.signature, signature_file.merkle, leaves, size)
+        else:
+            is_valid = verify_digest_cached(signer, hash_file(options['path']), signature_file.signature)
+        elapsed = time.perf_counter() - started
+
+        if is_valid:
+            self.stdout.write(self.style.SUCCESS(
+                f"VALID: signed by '{signature_file.signer}' (checked in {elapsed:.2f}s)."
+            ))
+        elif altered:
+            self.stdout.write(self.style.ERROR(f"INVALID: {len(altered)} altered byte range(s):"))
+            for start, end in altered:
+                self.stdout.write(f"  {start}-{end}")
+        else:
+            self.stdout.write(self.style.ERROR("INVALID: the signature does not match."))
@@ -0,0 +1,171 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .utils import HASH_CHUNK_SIZE, _local_path
+
+DEFAULT_MERKLE_CHUNK_SIZE = 4 * 1024 * 1024  # 4 MiB
+MIN_MERKLE_CHUNK_SIZE = 64 * 1024
+MAX_MERKLE_CHUNK_SIZE = 1024 ** 3
+
+# Merkle trees over fixed-size chunks, for signing very large files. Each chunk is
+# a leaf, sha256(0x00 || chunk); pairs of nodes hash as sha256(0x01 || left || right)
+# and a node without a partner moves up unchanged. The signature covers the root
+# together with the chunk size and file size (see signed_digest()), but the
+# signature file keeps the leaves, so a verifier can hash chunks in parallel and
+# tell exactly which chunks of a document were altered.
+_LEAF = b'\x00'
+_NODE = b'\x01'
+# Separates signed trees from whole-file digests: a bare one-leaf root is the
+# SHA-256 of 0x00 || chunk, so its signature would also pass for that file
+_SIGNED_TREE = b'dsig-merkle-v1'
+
+
+def leaf_hash(chunk) -> bytes:
+    h = hashlib.sha256(_LEAF)
+    h.update(chunk)
+    return h.digest()
+
+
+def merkle_root(leaves) -> bytes:
+    level = list(leaves) or [leaf_hash(b'')]
+    while len(level) > 1:
+        paired = [hashlib.sha256(_NODE + level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0]
+
+
+def signed_digest(chunk_size: int, size: int, leaves) -> bytes:
+    """The digest that Merkle mode signs for a tree of `leaves` over `size` bytes."""
+    h = hashlib.sha256(_SIGNED_TREE)
+    h.update(chunk_size.to_bytes(8, 'big'))
+    h.update(size.to_bytes(8, 'big'))
+    h.update(merkle_root(leaves))
+    return h.digest()
+
+
+def default_chunk_size() -> int:
+    return getattr(settings, 'MERKLE_CHUNK_SIZE', DEFAULT_MERKLE_CHUNK_SIZE)
+
+
+def valid_chunk_size(chunk_size) -> bool:
+    return isinstance(chunk_size, int) and MIN_MERKLE_CHUNK_SIZE <= chunk_size <= MAX_MERKLE_CHUNK_SIZE
+
+
+class MerkleHasher:
+    """
+    Computes the leaf hashes of a stream fed through update() in pieces of any
+    size, e.g. by an upload handler.
+    """
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self.leaves = []
+        self.size = 0
+        self._current = hashlib.sha256(_LEAF)
+        self._filled = 0
+
+    def update(self, data):
+        view = memoryview(data)
+        self.size += len(view)
+        while view:
+            take = min(len(view), self.chunk_size - self._filled)
+            self._current.update(view[:take])
+            self._filled += take
+            view = view[take:]
+            if self._filled == self.chunk_size:
+                self.leaves.append(self._current.digest())
+                self._current = hashlib.sha256(_LEAF)
+                self._filled = 0
+
+    def finish(self) -> list:
+        if self._filled or not self.leaves:
+            self.leaves.append(self._current.digest())
+            self._filled = 0
+        return self.leaves
+
+
+def _hash_range(path, offset: int, length: int, read_size: int) -> bytes:
+    h = hashlib.sha256(_LEAF)
+    buf = bytearray(min(read_size, length) or 1)
+    view = memoryview(buf)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        remaining = length
+        while remaining > 0:
+            n = f.readinto(view[:min(len(buf), remaining)])
+            if not n:
+                break
+            h.update(view[:n])
+            remaining -= n
+    return h.digest()
+
+
+def chunk_hashes(source, chunk_size: int = None, max_workers: int = None):
+    """
+    Returns (leaves, size) for `source`, which may be anything hash_file()
+    accepts. Files on local disk are hashed chunk by chunk on a thread pool
+    (hashlib releases the GIL); other sources are streamed in order.
+    """
+    chunk_size = chunk_size or default_chunk_size()
+    path = _local_path(source)
+    if path is None:
+        hasher = MerkleHasher(chunk_size)
+        if hasattr(source, 'chunks'):
+            if getattr(source, 'closed', False):
+                source.open('rb')
+            for chunk in source.chunks(HASH_CHUNK_SIZE):
+                hasher.update(chunk)
+        else:
+            for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        return hasher.finish(), hasher.size
+
+    size = os.path.getsize(path)
+    offsets = range(0, size, chunk_size) if size else [0]
+    workers = max_workers or getattr(settings, 'MERKLE_HASH_WORKERS', None) or os.cpu_count() or 1
+    read_size = min(chunk_size, HASH_CHUNK_SIZE)
+    with ThreadPoolExecutor(max_workers=min(workers, len(offsets))) as pool:
+        leaves = list(pool.map(lambda offset: _hash_range(path, offset, min(chunk_size, size - offset), read_size),
+                               offsets))
+    return leaves, size
+
+
+def read_signed_tree(data: dict):
+    """
+    Parses the "merkle" object of a signature file into (chunk_size, size,
+    leaves). Raises ValueError when it is malformed.
+    """
+    try:
+        chunk_size, size, leaves = data['chunk_size'], data['size'], data['leaves']
+        leaves = [bytes.fromhex(leaf) for leaf in leaves]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("The signature file's Merkle tree is malformed.") from None
+    if not valid_chunk_size(chunk_size) or not isinstance(size, int) or size < 0 \
+            or len(leaves) != max(1, -(-size // chunk_size)) or any(len(leaf) != 32 for leaf in leaves):
+        raise ValueError("The signature file's Merkle tree is malformed.")
+    return chunk_size, size, leaves
+
+
+def altered_ranges(signed_leaves, leaves, chunk_size: int, signed_size: int, size: int):
+    """
+    Compares a document's leaves against the signed ones and returns the
+    altered byte ranges of the document as merged, inclusive (start, end)
+    pairs. Content appended to or cut from the end shows up as a range too.
+    """
+    changed = [i for i in range(max(len(signed_leaves), len(leaves)))
+               if i >= len(signed_leaves) or i >= len(leaves) or signed_leaves[i] != leaves[i]]
+    ranges = []
+    for i in changed:
+        start = i * chunk_size
+        end = min((i + 1) * chunk_size, max(size, signed_size)) - 1
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    if not ranges and size != signed_size:
+        ranges.append((min(size, signed_size), max(size, signed_size) - 1))
+    return ranges
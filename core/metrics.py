@@ -0,0 +1,251 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+# Seconds; stages range from sub-millisecond cache hits to multi-second hashes of large files
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_NOOP = nullcontext()
+# METRICS_ENABLED, read once: a settings lookup costs more than the rest of a disabled stage()
+_enabled = None
+
+
+def enabled() -> bool:
+    global _enabled
+    if _enabled is None:
+        _enabled = getattr(settings, 'METRICS_ENABLED', False)
+    return _enabled
+
+
+def _setting_changed(setting, **kwargs):
+    global _enabled
+    if setting == 'METRICS_ENABLED':
+        _enabled = None
+
+
+setting_changed.connect(_setting_changed)
+
+
+class RequestStats:
+    # Per-request totals for the Server-Timing header; shared with sync_to_async threads via the context
+    __slots__ = ('stages', 'queries', 'query_seconds')
+
+    def __init__(self):
+        self.stages = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+_request_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket (not cumulative) counts, then sum and count
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for label_values, counts, total, count in sorted(series):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, label_values, 'le="%s"' % bound)
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels, label_values, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{labels} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, label_values)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, label_values)} {count}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f'{self.name}{_format_labels(self.labels, label_values)} {value}' for label_values, value in values)
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge:
+    # Read when scraped: `collect()` returns {label values: value}
+    def __init__(self, name, help_text, labels, collect):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.collect = collect
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge']
+        lines.extend(f'{self.name}{_format_labels(self.labels, label_values)} {value}'
+                     for label_values, value in sorted(self.collect().items()))
+        return lines
+
+    def clear(self):
+        pass
+
+
+def _key_pool_depth():
+    # Shared by every process, so it comes from the database rather than a counter
+    from django.db.models import Count
+    from .models import PooledKeyPair
+
+    depth = {(getattr(settings, 'SIGNING_ALGORITHM', 'rsa'),): 0}
+    for row in PooledKeyPair.objects.values('algorithm').annotate(pairs=Count('pk')):
+        depth[(row['algorithm'],)] = row['pairs']
+    return depth
+
+
+stage_seconds = Histogram('dsig_stage_seconds', 'Time spent in each instrumented signing and verification stage.',
+                          ('stage',))
+request_seconds = Histogram('dsig_request_seconds', 'Time to produce a response, per view.',
+                            ('view', 'method', 'status'))
+request_queries = Histogram('dsig_request_queries', 'Database queries run per request, per view.',
+                            ('view',), QUERY_BUCKETS)
+bytes_hashed = Counter('dsig_bytes_hashed_total', 'Bytes hashed, by where they were read from.', ('source',))
+key_pairs_issued = Counter('dsig_key_pairs_issued_total',
+                           'Key pairs given to new users, claimed from the pool or generated inline.', ('source',))
+key_pool_depth = Gauge('dsig_key_pool_depth', 'Pre-generated key pairs waiting in the pool.', ('algorithm',),
+                       _key_pool_depth)
+key_pool_target = Gauge('dsig_key_pool_target', 'Pool depth fill_key_pool tops up to.', (),
+                        lambda: {(): getattr(settings, 'KEY_POOL_SIZE', 50)})
+REGISTRY = (stage_seconds, request_seconds, request_queries, bytes_hashed, key_pairs_issued, key_pool_depth,
+            key_pool_target)
+
+
+def record(name, seconds):
+    # For stages timed by the caller, e.g. where reads and hashing interleave
+    if not enabled():
+        return
+    stage_seconds.observe(seconds, name)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.stages[name] = stats.stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def _timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def stage(name):
+    """
+    Times the enclosed block as stage `name`, both in the process-wide
+    histogram and in the current request's Server-Timing. When metrics are
+    disabled this returns a shared no-op context manager.
+    """
+    return _timed(name) if enabled() else _NOOP
+
+
+def count_hashed(source, size):
+    if enabled():
+        bytes_hashed.inc(size, source)
+
+
+def count_key_pair(source):
+    # source is 'pool' or 'generated'
+    if enabled():
+        key_pairs_issued.inc(1, source)
+
+
+def count_query(execute, sql, params, many, context):
+    # Connection execute_wrapper; only requests being measured pay for the timing
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_seconds += time.perf_counter() - started
+
+
+def begin_request():
+    return _request_stats.set(RequestStats())
+
+
+def end_request(token, view, method, status, seconds):
+    stats = _request_stats.get()
+    _request_stats.reset(token)
+    request_seconds.observe(seconds, view, method, str(status))
+    request_queries.observe(stats.queries, view)
+    return stats
+
+
+def server_timing(stats, seconds):
+    parts = [f'{name};dur={duration * 1000:.2f}' for name, duration in stats.stages.items()]
+    parts.append(f'db;desc="{stats.queries} queries";dur={stats.query_seconds * 1000:.2f}')
+    parts.append(f'total;dur={seconds * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    for metric in REGISTRY:
+        metric.clear()
@@ -0,0 +1,61 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+
+def _install_query_counter(sender, connection, **kwargs):
+    # Connections reconnect on the same wrapper object, so guard against adding it twice
+    if metrics.count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.count_query)
+
+
+class MetricsMiddleware:
+    """
+    Records per-view latency and query counts, and with METRICS_SERVER_TIMING
+    adds a Server-Timing header listing the stages timed during the request.
+    Removes itself from the stack when METRICS_ENABLED is off.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics.enabled():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', False)
+        connection_created.connect(_install_query_counter, dispatch_uid='core.metrics.query_counter')
+        for connection in connections.all(initialized_only=True):
+            _install_query_counter(None, connection)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = metrics.begin_request()
+        started = time.perf_counter()
+        response = self.get_response(request)
+        return self._finish(request, response, token, started)
+
+    async def __acall__(self, request):
+        token = metrics.begin_request()
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        return self._finish(request, response, token, started)
+
+    def _finish(self, request, response, token, started):
+        # Streaming responses are measured up to the first byte
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        stats = metrics.end_request(token, view, request.method, response.status_code, elapsed)
+        if self.server_timing:
+            response['Server-Timing'] = metrics.server_timing(stats, elapsed)
+        return response
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_signed_files(apps, schema_editor):
+    UploadedFile = apps.get_model('core', 'UploadedFile')
+    UploadedFile.objects.exclude(signature__isnull=True).exclude(signature='').update(signing_status='signed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_keyrotation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='signing_status',
+            field=models.CharField(choices=[('unsigned', 'Not signed'), ('queued', 'Queued'), ('signing', 'Signing'), ('signed', 'Signed'), ('failed', 'Failed')], default='unsigned', max_length=10),
+        ),
+        migrations.RunPython(mark_signed_files, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='core_job_status_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_blob_uploadedfile_original_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='uploadedfile',
+            index=models.Index(fields=['owner', '-upload_date', '-id'], name='core_upload_owner_date_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_uploadedfile_owner_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pooledkeypair',
+            name='algorithm',
+            field=models.CharField(choices=[('rsa', 'RSA PKCS#1 v1.5 with SHA-256'), ('ed25519', 'Ed25519'), ('ecdsa-p256', 'ECDSA P-256 with SHA-256')], default='rsa', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='signature_algorithm',
+            field=models.CharField(blank=True, choices=[('rsa', 'RSA PKCS#1 v1.5 with SHA-256'), ('ed25519', 'Ed25519'), ('ecdsa-p256', 'ECDSA P-256 with SHA-256')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='userkeypair',
+            name='algorithm',
+            field=models.CharField(choices=[('rsa', 'RSA PKCS#1 v1.5 with SHA-256'), ('ed25519', 'Ed25519'), ('ecdsa-p256', 'ECDSA P-256 with SHA-256')], default='rsa', max_length=20),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_signature_algorithms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='merkle_chunk_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='merkle_leaves',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='signature_mode',
+            field=models.CharField(choices=[('digest', 'SHA-256 of the whole file'), ('merkle', 'Merkle root of fixed-size chunks')], default='digest', max_length=10),
+        ),
+    ]
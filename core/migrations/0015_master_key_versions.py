@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pooledkeypair',
+            name='key_version',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='userkeypair',
+            name='key_version',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+        migrations.CreateModel(
+            name='ReencryptionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key_version', models.CharField(max_length=16)),
+                ('table', models.CharField(max_length=100)),
+                ('last_pk', models.BigIntegerField(default=0)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('key_version', 'table'), name='core_reencryption_unique_table')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_master_key_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='keyrotation',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
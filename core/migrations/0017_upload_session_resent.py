@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_key_rotation_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='resent',
+            field=models.BooleanField(default=False),
+        ),
+    ]
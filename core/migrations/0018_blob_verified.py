@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_upload_session_resent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='verified',
+            field=models.BooleanField(default=False),
+        ),
+    ]
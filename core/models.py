@@ -2,21 +2,210 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
 import os
+import uuid
+
+from .algorithms import ALGORITHM_CHOICES, RSA_PKCS1_SHA256
+from .storage import select_upload_storage
 
 class UploadedFile(models.Model):
+    SIGNING_UNSIGNED = 'unsigned'
+    SIGNING_QUEUED = 'queued'
+    SIGNING_RUNNING = 'signing'
+    SIGNING_DONE = 'signed'
+    SIGNING_FAILED = 'failed'
+    SIGNING_STATUS_CHOICES = [
+        (SIGNING_UNSIGNED, 'Not signed'),
+        (SIGNING_QUEUED, 'Queued'),
+        (SIGNING_RUNNING, 'Signing'),
+        (SIGNING_DONE, 'Signed'),
+        (SIGNING_FAILED, 'Failed'),
+    ]
+    SIGNATURE_DIGEST = 'digest'
+    SIGNATURE_MERKLE = 'merkle'
+    SIGNATURE_MODE_CHOICES = [
+        (SIGNATURE_DIGEST, 'SHA-256 of the whole file'),
+        (SIGNATURE_MERKLE, 'Merkle root of fixed-size chunks'),
+    ]
+
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
-    uploaded_file = models.FileField(upload_to='uploads/')
+    uploaded_file = models.FileField(upload_to='uploads/', storage=select_upload_storage)
+    original_name = models.CharField(max_length=255, blank=True)
     upload_date = models.DateTimeField(default=timezone.now)
     signature = models.TextField(blank=True, null=True)
+    signature_algorithm = models.CharField(max_length=20, choices=ALGORITHM_CHOICES, blank=True)
+    signature_mode = models.CharField(max_length=10, choices=SIGNATURE_MODE_CHOICES, default=SIGNATURE_DIGEST)
+    # Chunk size and hex leaf hashes of a Merkle-mode signature
+    merkle_chunk_size = models.PositiveIntegerField(blank=True, null=True)
+    merkle_leaves = models.JSONField(blank=True, null=True)
+    signing_status = models.CharField(max_length=10, choices=SIGNING_STATUS_CHOICES, default=SIGNING_UNSIGNED)
+    # Content digests (hex) and size, computed while the upload streams in
+    sha256 = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    blake2b = models.CharField(max_length=128, blank=True, null=True, db_index=True)
+    size = models.BigIntegerField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Serves the per-owner, newest-first keyset pagination of the file list
+            models.Index(fields=['owner', '-upload_date', '-id'], name='core_upload_owner_date_idx'),
+        ]
     
     def __str__(self):
-        return os.path.basename(self.uploaded_file.name)
+        return self.original_name or os.path.basename(self.uploaded_file.name)
 
 class UserKeyPair(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
+    algorithm = models.CharField(max_length=20, choices=ALGORITHM_CHOICES, default=RSA_PKCS1_SHA256)
     public_key = models.TextField()
     private_key_encrypted = models.TextField()
+    # Version of the master key (FERNET_KEYS) that encrypted the private key; blank when written
+    # before master keys could be rotated
+    key_version = models.CharField(max_length=16, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Key pair for {self.user.username}"
\ No newline at end of file
+        return f"Key pair for {self.user.username}"
+
+class PooledKeyPair(models.Model):
+    # Pre-generated key pairs waiting to be claimed by newly registered users
+    algorithm = models.CharField(max_length=20, choices=ALGORITHM_CHOICES, default=RSA_PKCS1_SHA256)
+    public_key = models.TextField()
+    private_key_encrypted = models.TextField()
+    key_version = models.CharField(max_length=16, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Pooled key pair #{self.pk}"
+
+
+class ReencryptionCheckpoint(models.Model):
+    """
+    How far `manage.py reencrypt_keys` got re-encrypting one table's private
+    keys under master key `key_version`, so an interrupted run resumes there.
+    """
+    key_version = models.CharField(max_length=16)
+    table = models.CharField(max_length=100)
+    last_pk = models.BigIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    # Rows none of FERNET_KEYS could decrypt; they are left as they were
+    failed = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['key_version', 'table'],
+                                               name='core_reencryption_unique_table')]
+
+    def __str__(self):
+        return f"Re-encryption of {self.table} to {self.key_version} ({self.processed} rows)"
+
+
+class KeyRotation(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # None rotates every user
+    user_ids = models.JSONField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed after every batch; a running rotation that stops beating was abandoned by its process
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Key rotation #{self.pk} ({self.status}, {self.processed}/{self.total})"
+
+
+
+class Job(models.Model):
+    """
+    A unit of background work in the database-backed queue drained by
+    `manage.py run_workers`.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'], name='core_job_status_created_idx')]
+
+    def __str__(self):
+        return f"{self.kind} job #{self.pk} ({self.status})"
+
+
+class Blob(models.Model):
+    # One physically stored file in ContentAddressedStorage and how many uploads share it
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    # Whether the stored file was hashed while it was written and matched sha256
+    verified = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.sha256} ({self.refcount} reference(s))"
+
+
+class UploadSession(models.Model):
+    # A resumable upload of one file, sent as fixed-size chunks in any order
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    # Set when a chunk arrives twice; a running digest may then have hashed bytes that were overwritten
+    resent = models.BooleanField(default=False)
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    @property
+    def staging_name(self):
+        # Where the chunks are written, relative to the upload storage
+        return f"partial/{self.pk}"
+
+    def chunk_length(self, index):
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def __str__(self):
+        return f"Upload of {self.name} ({self.pk})"
+
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['session', 'index'], name='core_uploadchunk_unique_index')]
@@ -0,0 +1,122 @@
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import KeyRotation, UserKeyPair
+from .utils import (SIGNER_CACHE_PREFIX, current_key_version, default_algorithm, encrypt_key, generate_keys,
+                    invalidate_user_keys, signer_cache)
+
+
+def _pending_user_ids(rotation):
+    users = User.objects.all()
+    if rotation.user_ids is not None:
+        users = users.filter(pk__in=rotation.user_ids)
+    # Users rotated by an earlier, interrupted run already have a newer key pair
+    pending = users.exclude(userkeypair__created_at__gte=rotation.created_at)
+    return users.count(), list(pending.order_by('pk').values_list('pk', flat=True))
+
+
+def _write_batch(user_ids, pairs, algorithm):
+    now = timezone.now()
+    key_version = current_key_version()
+    with transaction.atomic():
+        existing = {
+            key_pair.user_id: key_pair
+            for key_pair in UserKeyPair.objects.select_for_update().filter(user_id__in=user_ids)
+        }
+        to_update, to_create = [], []
+        for user_id, (private_key, public_key) in zip(user_ids, pairs):
+            key_pair = existing.get(user_id) or UserKeyPair(user_id=user_id)
+            key_pair.algorithm = algorithm
+            key_pair.public_key = public_key.decode('utf-8')
+            key_pair.private_key_encrypted = encrypt_key(private_key)
+            key_pair.key_version = key_version
+            key_pair.created_at = now
+            (to_update if key_pair.pk else to_create).append(key_pair)
+        UserKeyPair.objects.bulk_update(to_update, ['algorithm', 'public_key', 'private_key_encrypted', 'key_version',
+                                                    'created_at'])
+        UserKeyPair.objects.bulk_create(to_create)
+
+    # bulk_update/bulk_create don't send signals, so clear the key caches here
+    usernames = list(User.objects.filter(pk__in=user_ids).values_list('username', flat=True))
+    invalidate_user_keys(*user_ids)
+    for username in usernames:
+        signer_cache.discard(username)
+    cache.delete_many([SIGNER_CACHE_PREFIX + username for username in usernames])
+
+
+def _claimable(stale_after):
+    # Queued and failed rotations, plus running ones whose process stopped beating
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    abandoned = Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    return (Q(status__in=[KeyRotation.STATUS_PENDING, KeyRotation.STATUS_FAILED])
+            | Q(abandoned, status=KeyRotation.STATUS_RUNNING))
+
+
+def claimable_rotation_ids(stale_after):
+    return list(KeyRotation.objects.filter(_claimable(stale_after)).order_by('pk').values_list('pk', flat=True))
+
+
+def claim_rotation(rotation_id, stale_after):
+    """
+    Marks a rotation as running for this process and returns it, or returns
+    None when another process is running it. Running rotations count as
+    abandoned once their heartbeat is older than `stale_after` seconds.
+    """
+    # The conditional update is the claim: of two processes, only one changes the row
+    claimed = KeyRotation.objects.filter(_claimable(stale_after), pk=rotation_id).update(
+        status=KeyRotation.STATUS_RUNNING, heartbeat_at=timezone.now(),
+    )
+    return KeyRotation.objects.get(pk=rotation_id) if claimed else None
+
+
+def run_key_rotation(rotation, pool, batch_size=500, progress=None):
+    """
+    Regenerates key pairs for the users covered by `rotation`, generating keys
+    on `pool` and writing them in transactional batches. The rotation must
+    have been claimed with claim_rotation().
+
+    Users whose pair is newer than the rotation are skipped, so an interrupted
+    rotation resumes where it stopped.
+    """
+    rotation.status = KeyRotation.STATUS_RUNNING
+    rotation.started_at = rotation.started_at or timezone.now()
+    rotation.total, user_ids = _pending_user_ids(rotation)
+    rotation.processed = rotation.total - len(user_ids)
+    rotation.error = ''
+    rotation.heartbeat_at = timezone.now()
+    rotation.save(update_fields=['status', 'started_at', 'total', 'processed', 'error', 'heartbeat_at'])
+
+    key_size = getattr(settings, 'KEY_SIZE', 2048)
+    algorithm = default_algorithm()
+    generate = partial(generate_keys, algorithm=algorithm)
+    batches = [user_ids[i:i + batch_size] for i in range(0, len(user_ids), batch_size)]
+    try:
+        # Keep the pool busy on the next batch while the current one is written
+        upcoming = pool.map(generate, [key_size] * len(batches[0])) if batches else None
+        for index, batch in enumerate(batches):
+            pairs = list(upcoming)
+            if index + 1 < len(batches):
+                upcoming = pool.map(generate, [key_size] * len(batches[index + 1]))
+            _write_batch(batch, pairs, algorithm)
+            rotation.processed += len(batch)
+            rotation.heartbeat_at = timezone.now()
+            rotation.save(update_fields=['processed', 'heartbeat_at'])
+            if progress:
+                progress(rotation)
+    except BaseException as e:
+        rotation.status = KeyRotation.STATUS_FAILED
+        rotation.error = repr(e)
+        rotation.save(update_fields=['status', 'error'])
+        raise
+
+    rotation.status = KeyRotation.STATUS_DONE
+    rotation.finished_at = timezone.now()
+    rotation.save(update_fields=['status', 'finished_at'])
+    return rotation
@@ -1,12 +1,31 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserKeyPair
+from .models import UploadedFile, UserKeyPair
 
-from .utils import generate_keys, encrypt_key,create_or_update_user_keys
+from .utils import generate_keys, encrypt_key,create_or_update_user_keys, invalidate_signer, invalidate_user_keys
 
 @receiver(post_save, sender=User)
 def create_user_key_pair(sender, instance, created, **kwargs):
     if created:
-        create_or_update_user_keys(instance)
\ No newline at end of file
+        create_or_update_user_keys(instance)
+
+@receiver(post_save, sender=UserKeyPair)
+@receiver(post_delete, sender=UserKeyPair)
+def invalidate_cached_public_key(sender, instance, **kwargs):
+    invalidate_user_keys(instance.user_id)
+    try:
+        username = instance.user.username
+    except User.DoesNotExist:
+        return
+    invalidate_signer(username)
+
+
+@receiver(post_delete, sender=UploadedFile)
+def release_uploaded_file(sender, instance, **kwargs):
+    # Also runs for cascades (e.g. a deleted user), so blob refcounts never leak
+    if instance.uploaded_file:
+        storage, name = instance.uploaded_file.storage, instance.uploaded_file.name
+        transaction.on_commit(lambda: storage.delete(name))
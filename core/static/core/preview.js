@@ -9,7 +9,6 @@ document.addEventListener("DOMContentLoaded", () => {
 
     // Use a Map to store staged files, making it easy to avoid duplicates.
     const stagedFiles = new Map();
-    const MAX_FILES = 5;
 
     // When the "Select file" button is clicked, trigger the hidden file input
     selectFileBtn.addEventListener("click", () => {
@@ -62,25 +61,11 @@ document.addEventListener("DOMContentLoaded", () => {
 
     /**
      * Adds new files to the staging area, avoiding duplicates.
-     * A maximum of 5 files can be staged.
      * @param {FileList} files The files to add.
      */
     function addFilesToStage(files) {
-        const filesToAdd = Array.from(files);
-        const spaceLeft = MAX_FILES - stagedFiles.size;
-
-        if (filesToAdd.length > spaceLeft) {
-            alert(`You can only upload a maximum of ${MAX_FILES} files. Adding the first ${spaceLeft > 0 ? spaceLeft : 0} valid file(s) from your selection.`);
-            if (spaceLeft <= 0) {
-                return; // No space left, do nothing.
-            }
-        }
-
         let addedCount = 0;
-        for (const file of filesToAdd) {
-            if (addedCount >= spaceLeft) {
-                break; // Stop when we've filled the available space
-            }
+        for (const file of Array.from(files)) {
             const fileId = getFileId(file);
             if (!stagedFiles.has(fileId)) {
                 stagedFiles.set(fileId, file);
@@ -199,15 +184,9 @@ document.addEventListener("DOMContentLoaded", () => {
             container.id = 'add-more-container';
             container.className = 'text-center mt-3';
 
-            if (files.length < MAX_FILES) {
-                container.innerHTML = `<button type="button" id="select-more-files-btn" class="btn" style="background-color: rgba(128, 128, 128, 0.114);">Select more files</button>`;
-                dropZone.appendChild(container);
-                document.getElementById('select-more-files-btn').addEventListener('click', () => fileInput.click());
-            } else {
-                container.innerHTML = `<button type="button" class="btn" style="background-color: rgba(128, 128, 128, 0.114); cursor: not-allowed; opacity: 0.6;" disabled>Select more files</button>
-                                     <p class="text-muted mt-2">Maximum of ${MAX_FILES} files reached.</p>`;
-                dropZone.appendChild(container);
-            }
+            container.innerHTML = `<button type="button" id="select-more-files-btn" class="btn" style="background-color: rgba(128, 128, 128, 0.114);">Select more files</button>`;
+            dropZone.appendChild(container);
+            document.getElementById('select-more-files-btn').addEventListener('click', () => fileInput.click());
         }
     }
 
@@ -255,4 +234,130 @@ document.addEventListener("DOMContentLoaded", () => {
         const addMoreContainer = document.getElementById('add-more-container');
         if (addMoreContainer) addMoreContainer.remove();
     }
-});
\ No newline at end of file
+
+    /*
+     * Resumable upload. Each file gets an upload session on the server and is sent as
+     * fixed-size chunks, several at a time; a dropped connection only costs the chunks
+     * that were in flight. Session ids are remembered per file, so picking the same file
+     * again after a reload skips the chunks the server already has.
+     */
+    const uploadForm = document.getElementById('upload-form');
+    const FILE_CONCURRENCY = 2;
+    const CHUNK_CONCURRENCY = 4;
+    const CHUNK_RETRIES = 5;
+    let uploading = false;
+
+    const csrfToken = () => uploadForm.querySelector('[name=csrfmiddlewaretoken]').value;
+    const sessionKey = (file) => `upload-session:${getFileId(file)}`;
+    const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+    async function api(url, options = {}) {
+        const response = await fetch(url, {
+            credentials: 'same-origin',
+            ...options,
+            headers: { 'X-CSRFToken': csrfToken(), ...(options.headers || {}) },
+        });
+        if (!response.ok) {
+            const error = new Error(`${response.status} ${response.statusText}`);
+            error.status = response.status;
+            try { error.message = (await response.json()).error || error.message; } catch (e) { /* not JSON */ }
+            throw error;
+        }
+        return response.status === 204 ? null : response.json();
+    }
+
+    async function openSession(file) {
+        const savedId = localStorage.getItem(sessionKey(file));
+        if (savedId) {
+            try {
+                return await api(`${uploadForm.dataset.sessionUrl}${savedId}/`);
+            } catch (e) {
+                localStorage.removeItem(sessionKey(file));  // expired or finished
+            }
+        }
+        const session = await api(uploadForm.dataset.sessionUrl, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ name: file.name, size: file.size }),
+        });
+        localStorage.setItem(sessionKey(file), session.id);
+        return session;
+    }
+
+    async function putChunk(session, file, index) {
+        const start = index * session.chunk_size;
+        const blob = file.slice(start, Math.min(start + session.chunk_size, file.size));
+        for (let attempt = 0; ; attempt++) {
+            try {
+                return await api(`${uploadForm.dataset.sessionUrl}${session.id}/?offset=${start}`, { method: 'PUT', body: blob });
+            } catch (e) {
+                // Client errors won't go away by retrying; network errors and 5xx might
+                if ((e.status && e.status < 500) || attempt >= CHUNK_RETRIES) throw e;
+                await sleep(Math.min(1000 * 2 ** attempt, 15000));
+            }
+        }
+    }
+
+    // Runs `worker` over `items` with at most `limit` in flight
+    async function runPool(items, limit, worker) {
+        const queue = items.slice();
+        const runners = Array.from({ length: Math.min(limit, queue.length) }, async () => {
+            while (queue.length) await worker(queue.shift());
+        });
+        await Promise.all(runners);
+    }
+
+    function showProgress(fileId, text) {
+        const preview = previewContainer.querySelector(`[data-file-id="${CSS.escape(fileId)}"] .file-size`);
+        if (preview) preview.textContent = text;
+    }
+
+    async function uploadFile(file) {
+        const fileId = getFileId(file);
+        const session = await openSession(file);
+        const chunkCount = Math.max(1, Math.ceil(file.size / session.chunk_size));
+        const received = new Set(session.received);
+        const pending = [...Array(chunkCount).keys()].filter(i => !received.has(i));
+        let done = chunkCount - pending.length;
+        showProgress(fileId, `${Math.floor(100 * done / chunkCount)}%`);
+
+        await runPool(pending, CHUNK_CONCURRENCY, async (index) => {
+            await putChunk(session, file, index);
+            done++;
+            showProgress(fileId, `${Math.floor(100 * done / chunkCount)}%`);
+        });
+        await api(`${uploadForm.dataset.sessionUrl}${session.id}/complete/`, { method: 'POST' });
+        localStorage.removeItem(sessionKey(file));
+        showProgress(fileId, 'Uploaded');
+    }
+
+    if (uploadForm && uploadForm.dataset.sessionUrl && window.fetch) {
+        uploadForm.addEventListener('submit', async (e) => {
+            e.preventDefault();
+            if (uploading || stagedFiles.size === 0) return;
+            uploading = true;
+            const submitBtn = uploadForm.querySelector('[type=submit]');
+            submitBtn.disabled = true;
+
+            const failed = [];
+            await runPool(Array.from(stagedFiles.values()), FILE_CONCURRENCY, async (file) => {
+                try {
+                    await uploadFile(file);
+                    stagedFiles.delete(getFileId(file));
+                } catch (err) {
+                    console.error(err);
+                    failed.push(file.name);
+                    showProgress(getFileId(file), 'Failed');
+                }
+            });
+
+            uploading = false;
+            submitBtn.disabled = false;
+            if (failed.length === 0) {
+                window.location.href = uploadForm.dataset.listUrl;
+            } else {
+                alert(`These files could not be uploaded: ${failed.join(', ')}. Press Upload again to resume them.`);
+            }
+        });
+    }
+});
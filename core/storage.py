@@ -0,0 +1,109 @@
+import hashlib
+import os
+import uuid
+
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+
+def select_upload_storage():
+    # Callable for FileField(storage=...) so the backend can be swapped in settings.STORAGES
+    return storages['uploads']
+
+
+class _HashingFile(File):
+    # Hashes what the storage copies. It has no temporary_file_path(), so the bytes are always copied.
+    def __init__(self, content):
+        super().__init__(content, getattr(content, 'name', None))
+        self.sha256 = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        for chunk in super().chunks(chunk_size):
+            self.sha256.update(chunk)
+            yield chunk
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each file under the SHA-256 digest of its content, so identical
+    uploads share one physical file.
+
+    A Blob row counts the references to every stored digest: save() adds one
+    and delete() removes one, deleting the file only when the last reference
+    goes away. Both write to the row before reading anything, so concurrent
+    uploads queue on its lock (on SQLite, the busy timeout) instead of failing
+    to upgrade a read lock.
+
+    A digest attached by the caller is not trusted: a blob is hashed while it
+    is written and rejected unless it matches, and only blobs checked that way
+    are reused without writing them again. Names outside the blob prefix are treated as plain files, so
+    files saved before switching to this storage keep working.
+    """
+    def __init__(self, prefix='blobs', **kwargs):
+        self.prefix = prefix.strip('/')
+        # Writing a blob twice only ever writes identical bytes
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    def blob_name(self, digest):
+        return f"{self.prefix}/{digest[:2]}/{digest[2:4]}/{digest}"
+
+    def digest_from_name(self, name):
+        if name and name.startswith(self.prefix + '/'):
+            return os.path.basename(name)
+        return None
+
+    def save(self, name, content, max_length=None):
+        from .utils import digest_file
+
+        # upload_view attaches the digest computed while the upload streamed in
+        digest = getattr(content, 'sha256', None)
+        size = getattr(content, 'size', None)
+        if not digest:
+            digest, _, size = digest_file(content)
+            content.seek(0)
+        name = self.blob_name(digest)
+
+        Blob = apps.get_model('core', 'Blob')
+        with transaction.atomic():
+            if not Blob.objects.filter(pk=digest).update(refcount=F('refcount') + 1):
+                try:
+                    with transaction.atomic():
+                        Blob.objects.create(sha256=digest, size=size or 0, refcount=1)
+                except IntegrityError:
+                    # A concurrent first upload of the same content inserted it
+                    Blob.objects.filter(pk=digest).update(refcount=F('refcount') + 1)
+            if not (Blob.objects.filter(pk=digest, verified=True).exists() and self.exists(name)):
+                self._write_checked(name, content, digest)
+                Blob.objects.filter(pk=digest).update(verified=True)
+        return name
+
+    def _write_checked(self, name, content, digest):
+        # Written beside the blob and renamed into place, so a mismatch never replaces a stored file
+        hashed = _HashingFile(content)
+        partial = super().save(f"{name}.{uuid.uuid4().hex}.partial", hashed)
+        if hashed.sha256.hexdigest() != digest:
+            super().delete(partial)
+            raise SuspiciousFileOperation(f"The content saved as {name} does not match its SHA-256.")
+        os.replace(self.path(partial), self.path(name))
+
+    def get_available_name(self, name, max_length=None):
+        # Blob names are unique by construction
+        return name
+
+    def delete(self, name):
+        digest = self.digest_from_name(name)
+        if digest is None:
+            return super().delete(name)
+
+        Blob = apps.get_model('core', 'Blob')
+        with transaction.atomic():
+            Blob.objects.filter(pk=digest, refcount__gt=0).update(refcount=F('refcount') - 1)
+            Blob.objects.filter(pk=digest, refcount=0).delete()
+            if Blob.objects.filter(pk=digest).exists():
+                return
+            super().delete(name)
@@ -0,0 +1,112 @@
+import base64
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import metrics
+from .jobs import job_handler
+from .models import UploadedFile, UserKeyPair
+from .merkle import chunk_hashes, default_chunk_size, signed_digest
+from .utils import digest_file, load_private_key, sign_digest
+
+# Fields set by _signing_payload() that callers have to save
+PAYLOAD_FIELDS = ['sha256', 'blake2b', 'size', 'signature_mode', 'merkle_chunk_size', 'merkle_leaves']
+
+
+def _fill_digest(uploaded_file: UploadedFile):
+    digest = digest_file(uploaded_file.uploaded_file, blake2b=getattr(settings, 'UPLOAD_BLAKE2B', False))
+    uploaded_file.sha256, uploaded_file.blake2b, uploaded_file.size = digest
+
+
+def _signing_payload(uploaded_file: UploadedFile) -> bytes:
+    """
+    Returns the digest to sign: the file's SHA-256, or for files of at least
+    MERKLE_SIGN_THRESHOLD bytes the Merkle root of their chunks, hashed in
+    parallel, bound to the chunk and file size by signed_digest(). Doesn't
+    touch the database, so it is safe on worker threads; callers save
+    PAYLOAD_FIELDS.
+    """
+    if not uploaded_file.sha256:
+        _fill_digest(uploaded_file)
+    threshold = getattr(settings, 'MERKLE_SIGN_THRESHOLD', 0)
+    if threshold and uploaded_file.size >= threshold:
+        chunk_size = default_chunk_size()
+        leaves, _ = chunk_hashes(uploaded_file.uploaded_file, chunk_size)
+        uploaded_file.signature_mode = UploadedFile.SIGNATURE_MERKLE
+        uploaded_file.merkle_chunk_size = chunk_size
+        uploaded_file.merkle_leaves = [leaf.hex() for leaf in leaves]
+        return signed_digest(chunk_size, uploaded_file.size, leaves)
+    uploaded_file.signature_mode = UploadedFile.SIGNATURE_DIGEST
+    uploaded_file.merkle_chunk_size = uploaded_file.merkle_leaves = None
+    return bytes.fromhex(uploaded_file.sha256)
+
+
+def sign_uploaded_file(uploaded_file: UploadedFile):
+    UploadedFile.objects.filter(pk=uploaded_file.pk).update(signing_status=UploadedFile.SIGNING_RUNNING)
+    try:
+        with metrics.stage('key_lookup'):
+            key_pair = UserKeyPair.objects.get(user_id=uploaded_file.owner_id)
+        # Signs the stored digest; storage is only read for files uploaded before digests were
+        # kept and for files large enough to be signed in Merkle mode
+        signature_bytes = sign_digest(load_private_key(key_pair), _signing_payload(uploaded_file), key_pair.algorithm)
+    except Exception:
+        UploadedFile.objects.filter(pk=uploaded_file.pk).update(signing_status=UploadedFile.SIGNING_FAILED)
+        raise
+
+    uploaded_file.signature = base64.b64encode(signature_bytes).decode('utf-8')
+    uploaded_file.signature_algorithm = key_pair.algorithm
+    uploaded_file.signing_status = UploadedFile.SIGNING_DONE
+    uploaded_file.save(update_fields=['signature', 'signature_algorithm', 'signing_status', *PAYLOAD_FIELDS])
+
+
+@job_handler('sign_file')
+def sign_file_job(file_id):
+    uploaded_file = UploadedFile.objects.filter(pk=file_id).first()
+    if uploaded_file is None:
+        return  # deleted while queued
+    sign_uploaded_file(uploaded_file)
+
+
+def sign_uploaded_files(user, uploaded_files, max_workers=None):
+    """
+    Signs many of `user`'s files with one key lookup and decrypt. Files are
+    hashed concurrently (hashlib releases the GIL) and all signatures are
+    written with a single bulk_update. Returns one result dict per file.
+    """
+    uploaded_files = list(uploaded_files)
+    if not uploaded_files:
+        return []
+    with metrics.stage('key_lookup'):
+        key_pair = UserKeyPair.objects.get(user=user)
+    private_key = load_private_key(key_pair)
+
+    def hash_one(uploaded_file):
+        # Runs on the thread pool, so it only hashes; the digests are saved by the bulk_update below
+        try:
+            return _signing_payload(uploaded_file), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max_workers or min(8, len(uploaded_files))) as pool:
+        digests = list(pool.map(hash_one, uploaded_files))
+
+    results = []
+    for uploaded_file, (digest, error) in zip(uploaded_files, digests):
+        if error is None:
+            try:
+                signature_bytes = sign_digest(private_key, digest, key_pair.algorithm)
+            except Exception as e:
+                error = e
+        if error is not None:
+            uploaded_file.signing_status = UploadedFile.SIGNING_FAILED
+            results.append({'id': uploaded_file.pk, 'name': str(uploaded_file), 'status': 'failed', 'error': str(error)})
+        else:
+            uploaded_file.signature = base64.b64encode(signature_bytes).decode('utf-8')
+            uploaded_file.signature_algorithm = key_pair.algorithm
+            uploaded_file.signing_status = UploadedFile.SIGNING_DONE
+            results.append({'id': uploaded_file.pk, 'name': str(uploaded_file), 'status': 'signed'})
+
+    UploadedFile.objects.bulk_update(
+        uploaded_files, ['signature', 'signature_algorithm', 'signing_status', *PAYLOAD_FIELDS], batch_size=500,
+    )
+    return results
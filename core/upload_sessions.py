@@ -0,0 +1,236 @@
+import hashlib
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .cache import LRUCache
+from .models import UploadChunk, UploadedFile, UploadSession
+from .storage import select_upload_storage
+from .utils import HASH_CHUNK_SIZE
+
+DEFAULT_UPLOAD_CHUNK_SIZE = 8 * 1024 ** 2
+DEFAULT_UPLOAD_SESSION_MAX_SIZE = 16 * 1024 ** 3
+DEFAULT_UPLOAD_SESSIONS_PER_USER = 20
+DEFAULT_UPLOAD_RESERVED_BYTES_PER_USER = 2 * DEFAULT_UPLOAD_SESSION_MAX_SIZE
+
+
+class UploadSessionError(ValueError):
+    """The request can't be applied to the upload session."""
+
+
+class _RunningDigest:
+    """
+    SHA-256 (and optionally BLAKE2b) of the chunks received so far, in order.
+    `next_index` is the first chunk not yet hashed; the lock keeps concurrent
+    chunk requests from feeding the hashers out of order.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_index = 0
+        self.sha256 = hashlib.sha256()
+        self.blake2b = hashlib.blake2b() if getattr(settings, 'UPLOAD_BLAKE2B', False) else None
+
+    def update(self, data):
+        self.sha256.update(data)
+        if self.blake2b is not None:
+            self.blake2b.update(data)
+
+
+# Hash state can't be stored, so it lives in the process that received the first chunk.
+# Sessions whose chunks went elsewhere are hashed from the staged file when finished.
+_running_digests = LRUCache(maxsize=256, ttl=6 * 3600)
+
+
+def _staging_path(session):
+    return select_upload_storage().path(session.staging_name)
+
+
+def _expiry_cutoff():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'UPLOAD_SESSION_TTL', 24 * 3600))
+
+
+def _check_user_limits(owner):
+    # Every staged file reserves its full size on disk, so open sessions are capped per user
+    max_sessions = getattr(settings, 'UPLOAD_SESSIONS_PER_USER', DEFAULT_UPLOAD_SESSIONS_PER_USER)
+    max_reserved = getattr(settings, 'UPLOAD_RESERVED_BYTES_PER_USER', DEFAULT_UPLOAD_RESERVED_BYTES_PER_USER)
+    # Counts the owner's concurrent starts one at a time on PostgreSQL; on SQLite the insert already did
+    User.objects.select_for_update().filter(pk=owner.pk).first()
+    open_sessions = UploadSession.objects.filter(owner=owner, created_at__gte=_expiry_cutoff()).aggregate(
+        count=Count('pk'), reserved=Sum('size'),
+    )
+    if open_sessions['count'] > max_sessions:
+        raise UploadSessionError(f"You can have at most {max_sessions} unfinished uploads. "
+                                 "Finish or cancel some first.")
+    if open_sessions['reserved'] > max_reserved:
+        raise UploadSessionError(f"Your unfinished uploads can total at most {max_reserved} bytes. "
+                                 "Finish or cancel some first.")
+
+
+def start_session(owner, name, size):
+    max_size = getattr(settings, 'UPLOAD_SESSION_MAX_SIZE', DEFAULT_UPLOAD_SESSION_MAX_SIZE)
+    # bool is an int subclass, but `true` is not a size
+    if isinstance(size, bool) or not isinstance(size, int) or size < 0:
+        raise UploadSessionError("'size' must be a non-negative integer.")
+    if size > max_size:
+        raise UploadSessionError(f"Files can be at most {max_size} bytes.")
+    name = os.path.basename(str(name or '')).strip()
+    if not name:
+        raise UploadSessionError("'name' is required.")
+
+    with transaction.atomic():
+        # Inserted before the limits are checked, so two concurrent starts can't both fit in the last slot
+        session = UploadSession.objects.create(
+            owner=owner, name=name[:255], size=size,
+            chunk_size=getattr(settings, 'UPLOAD_CHUNK_SIZE', DEFAULT_UPLOAD_CHUNK_SIZE),
+        )
+        _check_user_limits(owner)
+    path = _staging_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        # Sparse, so chunks can land at their offsets in any order
+        f.truncate(size)
+    return session
+
+
+def received_chunks(session):
+    return list(session.chunks.order_by('index').values_list('index', flat=True))
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Writes one chunk, read from `stream`, at `offset` of the staged file. The
+    chunk is hashed on the way in when it is the next one the running digest
+    needs; otherwise it is picked up from disk once the gap before it fills.
+    Re-sending a chunk is harmless: it marks the session as resent, and
+    finish_session() then hashes the staged file again.
+    """
+    if offset % session.chunk_size or not 0 <= offset < max(session.size, 1):
+        raise UploadSessionError(f"The offset must be a multiple of {session.chunk_size} within the file.")
+    index = offset // session.chunk_size
+    if length != session.chunk_length(index):
+        raise UploadSessionError(f"Chunk {index} must be {session.chunk_length(index)} bytes.")
+
+    digest = _running_digests.get(session.pk)
+    if digest is None and index == 0:
+        digest = _RunningDigest()
+        _running_digests.set(session.pk, digest)
+    inline = digest is not None and digest.lock.acquire(blocking=False)
+    if inline and digest.next_index != index:
+        digest.lock.release()
+        inline = False
+    if digest is not None and index < digest.next_index:
+        # Already hashed; if the new bytes differ the digest would be wrong, so recompute it at the end
+        _running_digests.discard(session.pk)
+        digest = None
+
+    try:
+        with open(_staging_path(session), 'r+b') as f:
+            f.seek(offset)
+            remaining = length
+            while remaining:
+                data = stream.read(min(HASH_CHUNK_SIZE, remaining))
+                if not data:
+                    raise UploadSessionError(f"Chunk {index} was cut short.")
+                f.write(data)
+                if inline:
+                    digest.update(data)
+                remaining -= len(data)
+        _, created = UploadChunk.objects.update_or_create(session=session, index=index, defaults={'size': length})
+        if not created:
+            # The earlier copy may have been hashed here or by another process; only the database knows
+            UploadSession.objects.filter(pk=session.pk).update(resent=True)
+        if inline:
+            digest.next_index += 1
+    except Exception:
+        if inline:
+            # The hashers saw part of a chunk
+            _running_digests.discard(session.pk)
+        raise
+    finally:
+        if inline:
+            digest.lock.release()
+
+    if digest is not None:
+        _catch_up(session, digest, blocking=False)
+
+
+def _catch_up(session, digest, blocking):
+    # Hashes, from the staged file, the received chunks that directly follow the hashed prefix
+    if not digest.lock.acquire(blocking=blocking):
+        return
+    try:
+        received = set(session.chunks.filter(index__gte=digest.next_index).values_list('index', flat=True))
+        if digest.next_index not in received:
+            return
+        with open(_staging_path(session), 'rb') as f:
+            f.seek(digest.next_index * session.chunk_size)
+            while digest.next_index in received:
+                remaining = session.chunk_length(digest.next_index)
+                while remaining:
+                    data = f.read(min(HASH_CHUNK_SIZE, remaining))
+                    digest.update(data)
+                    remaining -= len(data)
+                digest.next_index += 1
+    finally:
+        digest.lock.release()
+
+
+def finish_session(session):
+    """
+    Turns a fully received session into an UploadedFile. The staged file is
+    copied into content-addressed storage under its digest. The running digest
+    is used only when no chunk was re-sent; otherwise the staged file is
+    hashed again from the start.
+    """
+    missing = session.chunk_count - session.chunks.count()
+    if missing:
+        raise UploadSessionError(f"{missing} chunk(s) have not been received yet.")
+
+    session.refresh_from_db(fields=['resent'])
+    digest = _running_digests.get(session.pk)
+    if digest is None or session.resent:
+        digest = _RunningDigest()
+    _catch_up(session, digest, blocking=True)
+    if digest.next_index != session.chunk_count:
+        digest = _RunningDigest()
+        _catch_up(session, digest, blocking=True)
+    _running_digests.discard(session.pk)
+
+    path = _staging_path(session)
+    content = File(open(path, 'rb'), name=session.name)
+    content.sha256 = digest.sha256.hexdigest()
+    content.size = session.size
+    try:
+        uploaded_file = UploadedFile.objects.create(
+            owner=session.owner,
+            uploaded_file=content,
+            original_name=session.name,
+            sha256=content.sha256,
+            blake2b=digest.blake2b.hexdigest() if digest.blake2b is not None else None,
+            size=session.size,
+        )
+    finally:
+        content.close()
+    discard_session(session)
+    return uploaded_file
+
+
+def discard_session(session):
+    _running_digests.discard(session.pk)
+    try:
+        # Gone already when it was moved into storage
+        os.remove(_staging_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def expired_sessions():
+    return UploadSession.objects.filter(created_at__lt=_expiry_cutoff())
@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+
+from . import metrics
+from .container import read_signature_file
+from .merkle import MerkleHasher
+from .utils import FileDigest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VERIFY_MAX_UPLOAD_SIZE = 2 * 1024 ** 3  # 2 GiB
+MAX_SIGNATURE_FILE_SIZE = 16 * 1024 ** 2  # Merkle signatures of huge files carry many leaves
+
+
+class HashedUpload:
+    """
+    Stands in for an uploaded file whose content was hashed and then discarded.
+    """
+    def __init__(self, name, content_type, size, digest, elapsed, leaves=None):
+        self.name = name
+        self.content_type = content_type
+        self.size = size
+        self.digest = digest
+        self.elapsed = elapsed
+        # Merkle leaf hashes, computed instead of `digest` for chunked signatures
+        self.leaves = leaves
+
+    def __str__(self):
+        return self.name or ''
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Keeps a running SHA-256 of the given form field as Django receives it.
+
+    The chunks are never buffered or written to a temporary file, so verifying
+    a large upload costs one chunk of memory. Other fields fall through to the
+    regular upload handlers.
+
+    If the signature file (JSON or binary) arrives first and holds a Merkle-mode signature, the
+    file's chunk hashes are computed instead, with the signed chunk size.
+    """
+    def __init__(self, request=None, field_name='original_file', max_size=None, signature_field='signature_file'):
+        super().__init__(request)
+        self.hashed_field = field_name
+        self.signature_field = signature_field
+        self._signature = bytearray()
+        self._capturing = False
+        if max_size is None:
+            max_size = getattr(settings, 'VERIFY_MAX_UPLOAD_SIZE', DEFAULT_VERIFY_MAX_UPLOAD_SIZE)
+        self.max_size = max_size
+        self.too_large = False
+        self._active = False
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self._capturing = field_name == self.signature_field
+        self._active = field_name == self.hashed_field
+        if self._active:
+            self._merkle = self._merkle_hasher()
+            self._hash = hashlib.sha256() if self._merkle is None else None
+            self._size = 0
+            self._started = time.perf_counter()
+            # Nobody else needs to store this file
+            raise StopFutureHandlers()
+
+    def _merkle_hasher(self):
+        try:
+            merkle = read_signature_file(bytes(self._signature)).merkle
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+        return MerkleHasher(merkle[0]) if merkle else None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self._capturing:
+            # Peek at the signature file; the regular handlers still store it
+            if len(self._signature) + len(raw_data) <= MAX_SIGNATURE_FILE_SIZE:
+                self._signature += raw_data
+            return raw_data
+        if not self._active:
+            return raw_data
+        self._size += len(raw_data)
+        if self.max_size and self._size > self.max_size:
+            self.too_large = True
+            self._active = False
+            # Drain the rest of the request without storing it so the view can still respond
+            raise StopUpload(connection_reset=False)
+        if self._merkle is not None:
+            self._merkle.update(raw_data)
+        else:
+            self._hash.update(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self._capturing = False
+        if not self._active:
+            return None
+        self._active = False
+        elapsed = time.perf_counter() - self._started
+        logger.info(
+            "Hashed %s (%d bytes) in %.3fs, %.1f MB/s",
+            self.file_name, self._size, elapsed,
+            self._size / elapsed / 1024 ** 2 if elapsed else 0.0,
+        )
+        metrics.record('upload_hash', elapsed)
+        metrics.count_hashed('upload', self._size)
+        if self._merkle is not None:
+            return HashedUpload(self.file_name, self.content_type, self._size, None, elapsed, self._merkle.finish())
+        return HashedUpload(self.file_name, self.content_type, self._size, self._hash.digest(), elapsed)
+
+
+class DigestUploadHandler(FileUploadHandler):
+    """
+    Computes the SHA-256 (and, if enabled, BLAKE2b) digest and size of every
+    uploaded file while passing the data on to the handlers that store it.
+
+    Digests are collected per field in upload order, matching
+    request.FILES.getlist(field_name).
+    """
+    def __init__(self, request=None, blake2b=None):
+        super().__init__(request)
+        if blake2b is None:
+            blake2b = getattr(settings, 'UPLOAD_BLAKE2B', False)
+        self.blake2b = blake2b
+        self.digests = defaultdict(list)
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._sha256 = hashlib.sha256()
+        self._blake2b = hashlib.blake2b() if self.blake2b else None
+        self._size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self._sha256.update(raw_data)
+        if self._blake2b is not None:
+            self._blake2b.update(raw_data)
+        self._size += len(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        metrics.count_hashed('upload', self._size)
+        self.digests[self.field_name].append(FileDigest(
+            self._sha256.hexdigest(),
+            self._blake2b.hexdigest() if self._blake2b is not None else None,
+            self._size,
+        ))
+        # Let the next handler build the actual file object
+        return None
@@ -1,14 +1,26 @@
 from . import views
 from .views import UserFileListView
 from django.urls import path
+from django.contrib.auth.decorators import login_required
 
 urlpatterns=[
     path('', views.home, name='sign-home'),
     path('about/',views.about,name='sign-about'),
     path('upload/', views.upload_view, name='upload_action'),
-    path('uploads/', UserFileListView.as_view(), name='user_file_list'),
+    path('upload/sessions/', views.upload_session_start_view, name='upload_session_start'),
+    path('upload/sessions/<uuid:session_id>/', views.upload_session_view, name='upload_session'),
+    path('upload/sessions/<uuid:session_id>/complete/', views.upload_session_complete_view,
+         name='upload_session_complete'),
+    path('uploads/', login_required(UserFileListView.as_view()), name='user_file_list'),
     path('sign-file/', views.sign_file_view, name='sign_file'),
+    path('sign-files/', views.sign_files_view, name='sign_files'),
+    path('file-status/', views.file_status_view, name='file_status'),
+    path('download/<int:file_id>/', views.download_file_view, name='download_file'),
     path('download-signature/<int:file_id>/', views.download_signature_view, name='download_signature'),
+    path('export/', views.export_signed_view, name='export_signed'),
     path('verify/',views.verify_signature_view, name='verify_signature'),
+    path('api/verify/', views.verify_batch_api, name='verify_batch_api'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('cache-stats/', views.cache_stats_view, name='cache_stats'),
     path('delete-file/<int:file_id>/', views.delete_file_view, name='delete_file'),
 ]
\ No newline at end of file
@@ -1,55 +1,462 @@
-from Crypto.PublicKey import RSA
-from Crypto.Signature import pkcs1_15
-from Crypto.Hash import SHA256
-
 from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import connection
+from django.core.files.storage import FileSystemStorage
 import base64
 import hashlib
-from cryptography.fernet import Fernet
+import mmap
+import os
+import threading
+import time
+from collections import namedtuple
+
+from.models import User,UserKeyPair,PooledKeyPair
+from .algorithms import RSA_PKCS1_SHA256, algorithm_for_key, get_algorithm, load_backends
+from . import metrics
+from .cache import LRUCache
+
+# The master keys that wrap private keys, built on first use (see _master_keys())
+_master_keys_instance = None
+_master_keys_lock = threading.Lock()
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MiB, keeps peak memory flat regardless of file size
+
+# Imported keys, keyed by (user id, UserKeyPair.created_at)
+private_key_cache = LRUCache(
+    maxsize=getattr(settings, 'KEY_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'KEY_CACHE_TTL', 300),
+)
+public_key_cache = LRUCache(
+    maxsize=getattr(settings, 'KEY_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'KEY_CACHE_TTL', 300),
+)
+
+# Hex digests and byte size of a file's content, as stored on UploadedFile
+FileDigest = namedtuple('FileDigest', ['sha256', 'blake2b', 'size'])
+
+# `fernet` encrypts with the first of FERNET_KEYS and decrypts with any of them; `by_version`
+# maps each key's version (as stored in key_version) to a Fernet of that key alone
+MasterKeys = namedtuple('MasterKeys', ['fernet', 'version', 'by_version'])
 
-from.models import User,UserKeyPair
+def _master_keys() -> MasterKeys:
+    # Derived once per process, and only by processes that touch private keys
+    global _master_keys_instance
+    if _master_keys_instance is None:
+        with _master_keys_lock:
+            if _master_keys_instance is None:
+                from cryptography.fernet import Fernet, MultiFernet
+                secrets = getattr(settings, 'FERNET_KEYS', None) or [settings.SECRET_KEY]
+                keys = [base64.urlsafe_b64encode(hashlib.sha256(secret.encode()).digest()) for secret in secrets]
+                fernets = [Fernet(key) for key in keys]
+                versions = [_key_version(key) for key in keys]
+                _master_keys_instance = MasterKeys(MultiFernet(fernets), versions[0], dict(zip(versions, fernets)))
+    return _master_keys_instance
 
-key_hash = hashlib.sha256(settings.SECRET_KEY.encode()).digest()
-fernet_key = base64.urlsafe_b64encode(key_hash)
-fernet = Fernet(fernet_key)
+def _key_version(fernet_key: bytes) -> str:
+    # Names a master key without revealing anything about it
+    return hashlib.sha256(b'key-version:' + fernet_key).hexdigest()[:16]
+
+def _reset_master_keys(setting, **kwargs):
+    global _master_keys_instance
+    if setting in ('SECRET_KEY', 'FERNET_KEYS'):
+        _master_keys_instance = None
+
+setting_changed.connect(_reset_master_keys)
+
+def warm_up():
+    """
+    Does the crypto setup that otherwise happens lazily in the first request
+    that needs it: deriving the key-wrapping Fernet and loading the signature
+    algorithms' native code. Call it in each worker after the fork, e.g. from
+    gunicorn's post_worker_init hook (see gunicorn.conf.py).
+    """
+    _master_keys()
+    load_backends()
+
+def current_key_version() -> str:
+    # Store this as key_version next to anything encrypt_key() returns
+    return _master_keys().version
 
 def encrypt_key(key_data: bytes) -> str:
-    return fernet.encrypt(key_data).decode()
+    return _master_keys().fernet.encrypt(key_data).decode()
 
-def decrypt_key(encrypted_data: str) -> bytes:
+def decrypt_key(encrypted_data: str, key_version: str = None) -> bytes:
+    master_keys = _master_keys()
+    # A known version goes straight to its key; otherwise every key is tried, newest first
+    fernet = master_keys.by_version.get(key_version) or master_keys.fernet
     return fernet.decrypt(encrypted_data.encode())
 
-def generate_keys(key_size=2048): #Generates RSA
-    key = RSA.generate(key_size)
-    private_key = key.export_key()
-    public_key = key.publickey().export_key()
-    return private_key, public_key
+def rotate_key(encrypted_data: str) -> str:
+    # Re-encrypts under the current master key; raises InvalidToken when none of FERNET_KEYS opens it
+    return _master_keys().fernet.rotate(encrypted_data.encode()).decode()
+
+def default_algorithm() -> str:
+    # The algorithm new and rotated key pairs use
+    return getattr(settings, 'SIGNING_ALGORITHM', RSA_PKCS1_SHA256)
+
+def generate_keys(key_size=2048, algorithm=None): #Generates a key pair, RSA unless configured otherwise
+    return get_algorithm(algorithm or default_algorithm()).generate(key_size)
+
+# Signer username -> (user id, created_at, public key PEM, algorithm). The shared tier lives
+# in Django's cache framework so every worker process benefits from one DB lookup.
+signer_cache = LRUCache(
+    maxsize=getattr(settings, 'KEY_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'SIGNER_CACHE_LOCAL_TTL', 30),
+)
+SIGNER_CACHE_PREFIX = 'core:signer2:'  # bumped when the cached entry's shape changes
+
+# A signer's key as used for verification; the fingerprint identifies the exact public key
+SignerKey = namedtuple('SignerKey', ['user_id', 'fingerprint', 'public_key', 'algorithm'])
+
+# Outcomes of earlier verifications, keyed by (user id, key fingerprint, digest,
+# SHA-256 of the signature). The user id lets a key regeneration drop its entries.
+verification_cache = LRUCache(
+    maxsize=getattr(settings, 'VERIFY_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'VERIFY_CACHE_TTL', 3600),
+)
+
+def load_private_key(key_pair: UserKeyPair):
+    # Decrypting and parsing the PEM is skipped while the pair is cached
+    cache_key = (key_pair.user_id, key_pair.created_at)
+    key = private_key_cache.get(cache_key)
+    if key is None:
+        with metrics.stage('fernet_decrypt'):
+            pem = decrypt_key(key_pair.private_key_encrypted, key_pair.key_version)
+        with metrics.stage('key_import'):
+            key = get_algorithm(key_pair.algorithm).import_key(pem)
+        private_key_cache.set(cache_key, key)
+    return key
+
+def _cached_public_key(user_id: int, created_at, public_key_pem: str, algorithm: str = RSA_PKCS1_SHA256):
+    cache_key = (user_id, created_at)
+    key = public_key_cache.get(cache_key)
+    if key is None:
+        with metrics.stage('key_import'):
+            key = get_algorithm(algorithm).import_key(public_key_pem)
+        public_key_cache.set(cache_key, key)
+    return key
+
+def load_public_key(key_pair: UserKeyPair):
+    return _cached_public_key(key_pair.user_id, key_pair.created_at, key_pair.public_key, key_pair.algorithm)
+
+def key_fingerprint(public_key_pem: str) -> str:
+    # Identifies one exact public key; cheap enough to compute on every lookup
+    return hashlib.sha256(public_key_pem.encode()).hexdigest()
+
+def _signer_key(user_id: int, created_at, public_key_pem: str, algorithm: str) -> SignerKey:
+    return SignerKey(
+        user_id, key_fingerprint(public_key_pem),
+        _cached_public_key(user_id, created_at, public_key_pem, algorithm), algorithm,
+    )
+
+def get_signer_key(username: str) -> SignerKey:
+    """
+    Returns the verification key of `username`, checking the in-process cache,
+    then Django's cache, then a single query joining UserKeyPair to User.
+
+    Raises UserKeyPair.DoesNotExist if the user or their key pair is missing.
+    """
+    if not getattr(settings, 'SIGNER_CACHE_ENABLED', True):
+        with metrics.stage('key_lookup'):
+            key_pair = UserKeyPair.objects.only('user_id', 'public_key', 'created_at', 'algorithm').get(user__username=username)
+        return _signer_key(key_pair.user_id, key_pair.created_at, key_pair.public_key, key_pair.algorithm)
+
+    entry = signer_cache.get(username)
+    if entry is None:
+        entry = cache.get(SIGNER_CACHE_PREFIX + username)
+        if entry is None:
+            with metrics.stage('key_lookup'):
+                key_pair = UserKeyPair.objects.only('user_id', 'public_key', 'created_at', 'algorithm').get(user__username=username)
+            entry = (key_pair.user_id, key_pair.created_at, key_pair.public_key, key_pair.algorithm)
+            cache.set(SIGNER_CACHE_PREFIX + username, entry, getattr(settings, 'SIGNER_CACHE_TTL', 600))
+        signer_cache.set(username, entry)
+    return _signer_key(*entry)
+
+def get_signer_public_key(username: str):
+    return get_signer_key(username).public_key
+
+async def aget_signer_key(username: str) -> SignerKey:
+    # Async counterpart of get_signer_key() for async views
+    if not getattr(settings, 'SIGNER_CACHE_ENABLED', True):
+        with metrics.stage('key_lookup'):
+            key_pair = await UserKeyPair.objects.only('user_id', 'public_key', 'created_at', 'algorithm').aget(user__username=username)
+        return _signer_key(key_pair.user_id, key_pair.created_at, key_pair.public_key, key_pair.algorithm)
 
-def sign_message(private_key_bytes: bytes, message: bytes) -> bytes: #Digitally Sign Documents 
-    private_key = RSA.import_key(private_key_bytes)
-    h = SHA256.new(message)
-    signature = pkcs1_15.new(private_key).sign(h)
-    return signature
+    entry = signer_cache.get(username)
+    if entry is None:
+        entry = await cache.aget(SIGNER_CACHE_PREFIX + username)
+        if entry is None:
+            with metrics.stage('key_lookup'):
+                key_pair = await UserKeyPair.objects.only('user_id', 'public_key', 'created_at', 'algorithm').aget(user__username=username)
+            entry = (key_pair.user_id, key_pair.created_at, key_pair.public_key, key_pair.algorithm)
+            await cache.aset(SIGNER_CACHE_PREFIX + username, entry, getattr(settings, 'SIGNER_CACHE_TTL', 600))
+        signer_cache.set(username, entry)
+    return _signer_key(*entry)
 
-def verify_signature(public_key_bytes: bytes, message: bytes, signature: bytes) -> bool:
+def get_signer_keys(usernames) -> dict:
+    """
+    Bulk get_signer_key(): returns {username: SignerKey} for every signer that
+    has a key pair, loading all cache misses with a single IN query. Unknown
+    usernames are left out of the result.
+    """
+    usernames = set(usernames)
+    use_cache = getattr(settings, 'SIGNER_CACHE_ENABLED', True)
+    entries = {}
+    if use_cache:
+        for username in usernames:
+            entry = signer_cache.get(username)
+            if entry is not None:
+                entries[username] = entry
+        missing = usernames - entries.keys()
+        if missing:
+            shared = cache.get_many([SIGNER_CACHE_PREFIX + username for username in missing])
+            for key, entry in shared.items():
+                entries[key[len(SIGNER_CACHE_PREFIX):]] = entry
+    missing = usernames - entries.keys()
+
+    if missing:
+        with metrics.stage('key_lookup'):
+            loaded = {
+                username: (user_id, created_at, public_key, algorithm)
+                for username, user_id, created_at, public_key, algorithm in UserKeyPair.objects.filter(
+                    user__username__in=missing,
+                ).values_list('user__username', 'user_id', 'created_at', 'public_key', 'algorithm')
+            }
+        if use_cache and loaded:
+            cache.set_many({SIGNER_CACHE_PREFIX + username: entry for username, entry in loaded.items()},
+                           getattr(settings, 'SIGNER_CACHE_TTL', 600))
+        entries.update(loaded)
+
+    if use_cache:
+        for username, entry in entries.items():
+            signer_cache.set(username, entry)
+    return {username: _signer_key(*entry) for username, entry in entries.items()}
+
+def invalidate_signer(username: str):
+    signer_cache.discard(username)
+    cache.delete(SIGNER_CACHE_PREFIX + username)
+
+def invalidate_user_keys(*user_ids: int):
+    # Drops the users' imported keys and any verification outcomes for their keys
+    user_ids = set(user_ids)
+    private_key_cache.discard_where(lambda cache_key: cache_key[0] in user_ids)
+    public_key_cache.discard_where(lambda cache_key: cache_key[0] in user_ids)
+    verification_cache.discard_where(lambda cache_key: cache_key[0] in user_ids)
+
+def _import_key(key, algorithm=None):
+    # Accepts an already imported key or PEM/DER bytes (RSA unless `algorithm` says otherwise)
+    if not isinstance(key, (bytes, str)):
+        return key
+    return get_algorithm(algorithm or RSA_PKCS1_SHA256).import_key(key)
+
+def _key_algorithm(key, algorithm=None):
+    return get_algorithm(algorithm) if algorithm else algorithm_for_key(key)
+
+def _local_path(source):
+    # Returns a filesystem path for sources that live on local disk, otherwise None
+    if isinstance(source, (str, os.PathLike)):
+        return source
+    storage = getattr(source, 'storage', None)
+    if isinstance(storage, FileSystemStorage) and getattr(source, 'name', None):
+        return storage.path(source.name)
+    return None
+
+def _hash_path(path, hashers, chunk_size: int, use_mmap: bool, read_time=None) -> int:
+    size = 0
+    with open(path, 'rb') as f:
+        if use_mmap and os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, len(view), chunk_size):
+                        for h in hashers:
+                            h.update(view[offset:offset + chunk_size])
+                    size = len(view)
+                finally:
+                    view.release()
+        else:
+            # Reuse one buffer for every read so no per-chunk bytes objects are allocated
+            buf = bytearray(chunk_size)
+            view = memoryview(buf)
+            while True:
+                if read_time is None:
+                    n = f.readinto(buf)
+                else:
+                    started = time.perf_counter()
+                    n = f.readinto(buf)
+                    read_time[0] += time.perf_counter() - started
+                if not n:
+                    break
+                for h in hashers:
+                    h.update(view[:n])
+                size += n
+    return size
+
+def _timed_reads(chunks, read_time):
+    while True:
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        read_time[0] += time.perf_counter() - started
+        if chunk is None:
+            return
+        yield chunk
+
+def _hash_source(source, hashers, chunk_size: int, use_mmap: bool) -> int:
+    # With metrics on, reading and hashing are recorded as separate stages (mmap reads count as hashing)
+    read_time = [0.0] if metrics.enabled() else None
+    started = time.perf_counter()
+    path = _local_path(source)
+    if path is not None:
+        size = _hash_path(path, hashers, chunk_size, use_mmap, read_time)
+    else:
+        if hasattr(source, 'chunks'):
+            # Django File objects (remote storages, uploaded files) stream via chunks()
+            if getattr(source, 'closed', False):
+                source.open('rb')
+            chunks = source.chunks(chunk_size)
+        else:
+            chunks = iter(lambda: source.read(chunk_size), b'')
+        if read_time is not None:
+            chunks = _timed_reads(iter(chunks), read_time)
+        size = 0
+        for chunk in chunks:
+            for h in hashers:
+                h.update(chunk)
+            size += len(chunk)
+
+    if read_time is not None:
+        metrics.record('storage_read', read_time[0])
+        metrics.record('hash', time.perf_counter() - started - read_time[0])
+        metrics.count_hashed('file', size)
+    return size
+
+def hash_file(source, chunk_size: int = HASH_CHUNK_SIZE, use_mmap: bool = False) -> bytes:
+    """
+    Returns the SHA-256 digest of `source`, reading it in `chunk_size` pieces.
+
+    `source` may be a filesystem path, a FieldFile/File (local storage is read
+    straight from disk, optionally through mmap) or any binary file-like object.
+    """
+    h = hashlib.sha256()
+    _hash_source(source, [h], chunk_size, use_mmap)
+    return h.digest()
+
+def digest_file(source, blake2b: bool = False, chunk_size: int = HASH_CHUNK_SIZE) -> FileDigest:
+    # Like hash_file(), but also returns the size and optionally a BLAKE2b digest from the same pass
+    hashers = [hashlib.sha256()] + ([hashlib.blake2b()] if blake2b else [])
+    size = _hash_source(source, hashers, chunk_size, False)
+    return FileDigest(hashers[0].hexdigest(), hashers[1].hexdigest() if blake2b else None, size)
+
+def sign_digest(private_key_bytes: bytes, digest: bytes, algorithm: str = None) -> bytes:
+    # Without `algorithm`, the scheme follows the type of the (imported) key
+    private_key = _import_key(private_key_bytes, algorithm)
+    with metrics.stage('sign'):
+        return _key_algorithm(private_key, algorithm).sign(private_key, digest)
+
+def sign_file(private_key_bytes: bytes, source, chunk_size: int = HASH_CHUNK_SIZE, use_mmap: bool = False,
+              algorithm: str = None) -> bytes:
+    # Hashes the file in chunks and signs only the final digest
+    return sign_digest(private_key_bytes, hash_file(source, chunk_size, use_mmap), algorithm)
+
+def sign_message(private_key_bytes: bytes, message: bytes, algorithm: str = None) -> bytes: #Digitally Sign Documents
+    return sign_digest(private_key_bytes, hashlib.sha256(message).digest(), algorithm)
+
+def verify_digest(public_key_bytes: bytes, digest: bytes, signature: bytes, algorithm: str = None) -> bool:
+    public_key = _import_key(public_key_bytes, algorithm)
+    with metrics.stage('verify'):
+        return _key_algorithm(public_key, algorithm).verify(public_key, digest, signature)
+
+def verify_digest_cached(signer: SignerKey, digest: bytes, signature: bytes) -> bool:
+    # A repeat of an earlier (key, digest, signature) check is answered from verification_cache
+    if not getattr(settings, 'VERIFY_CACHE_ENABLED', True):
+        return verify_digest(signer.public_key, digest, signature, signer.algorithm)
+    cache_key = (signer.user_id, signer.fingerprint, digest, hashlib.sha256(signature).digest())
+    valid = verification_cache.get(cache_key)
+    if valid is None:
+        valid = verify_digest(signer.public_key, digest, signature, signer.algorithm)
+        verification_cache.set(cache_key, valid)
+    return valid
+
+def key_cache_stats() -> dict:
+    return {
+        'private_keys': private_key_cache.stats(),
+        'public_keys': public_key_cache.stats(),
+        'signers': signer_cache.stats(),
+        'verifications': verification_cache.stats(),
+    }
+
+def verify_signature(public_key_bytes: bytes, message: bytes, signature: bytes, algorithm: str = None) -> bool:
     # Verify the documents
-    public_key = RSA.import_key(public_key_bytes)
-    h = SHA256.new(message)
-    try:
-        pkcs1_15.new(public_key).verify(h, signature)
-        return True
-    except (ValueError, TypeError):
-        return False
+    return verify_digest(public_key_bytes, hashlib.sha256(message).digest(), signature, algorithm)
+
+def _claim_returning(algorithm: str):
+    # One statement picks and removes the oldest pair: nothing is read before the write, so SQLite
+    # never has to upgrade a read lock (which fails at once under contention)
+    quote = connection.ops.quote_name
+    table = quote(PooledKeyPair._meta.db_table)
+    oldest = f"SELECT {quote('id')} FROM {table} WHERE {quote('algorithm')} = %s ORDER BY {quote('id')} LIMIT 1"
+    if connection.features.has_select_for_update_skip_locked:
+        oldest += " FOR UPDATE SKIP LOCKED"
+    columns = ', '.join(quote(field.column) for field in PooledKeyPair._meta.concrete_fields)
+    claimed = list(PooledKeyPair.objects.raw(
+        f"DELETE FROM {table} WHERE {quote('id')} = ({oldest}) RETURNING {columns}", [algorithm],
+    ))
+    return claimed[0] if claimed else None
+
+def claim_pooled_key_pair(algorithm: str = None):
+    """
+    Atomically takes one pre-generated pair of `algorithm` out of the pool.
+    Returns None when the pool is empty so the caller can fall back to
+    generating inline.
+    """
+    algorithm = algorithm or default_algorithm()
+    returning = connection.vendor in ('sqlite', 'postgresql') and connection.features.can_return_columns_from_insert
+    for _ in range(3):
+        if returning:
+            pooled = _claim_returning(algorithm)
+            if pooled is not None or not PooledKeyPair.objects.filter(algorithm=algorithm).exists():
+                return pooled
+            continue  # another worker removed the same pair first
+        pooled = PooledKeyPair.objects.filter(algorithm=algorithm).order_by('pk').first()
+        if pooled is None:
+            return None
+        # The conditional delete is the claim: only the worker whose delete removed the row owns the pair
+        deleted, _ = PooledKeyPair.objects.filter(pk=pooled.pk).delete()
+        if deleted:
+            return pooled
+    return None
+
+def key_pool_status():
+    return {
+        'algorithm': default_algorithm(),
+        'depth': PooledKeyPair.objects.filter(algorithm=default_algorithm()).count(),
+        'target': getattr(settings, 'KEY_POOL_SIZE', 50),
+    }
 
 def create_or_update_user_keys(user: User):
-    
+
     UserKeyPair.objects.filter(user=user).delete()
+    invalidate_user_keys(user.id)
 
-    private_key_bytes, public_key_bytes = generate_keys()
-    encrypted_private_key = encrypt_key(private_key_bytes)
+    algorithm = default_algorithm()
+    pooled = claim_pooled_key_pair(algorithm)
+    if pooled is not None:
+        metrics.count_key_pair('pool')
+        public_key = pooled.public_key
+        encrypted_private_key = pooled.private_key_encrypted
+        key_version = pooled.key_version
+    else:
+        metrics.count_key_pair('generated')
+        private_key_bytes, public_key_bytes = generate_keys(getattr(settings, 'KEY_SIZE', 2048), algorithm)
+        public_key = public_key_bytes.decode('utf-8')
+        encrypted_private_key = encrypt_key(private_key_bytes)
+        key_version = current_key_version()
 
     UserKeyPair.objects.create(
         user=user,
-        public_key=public_key_bytes.decode('utf-8'),
-        private_key_encrypted=encrypted_private_key
+        algorithm=algorithm,
+        public_key=public_key,
+        private_key_encrypted=encrypted_private_key,
+        key_version=key_version,
     )
\ No newline at end of file
@@ -0,0 +1,135 @@
+import base64
+import binascii
+import hashlib
+
+from django.conf import settings
+
+from .merkle import altered_ranges, signed_digest
+from .utils import get_signer_keys, verify_digest_cached
+from .workers import crypto_executor, default_worker_count
+
+DEFAULT_VERIFY_BATCH_MAX_ITEMS = 1000
+
+
+class BatchVerifyError(ValueError):
+    """The request as a whole is malformed; nothing was verified."""
+
+
+def _prepare_item(index, item):
+    # Returns (result, digest, signature) where result already carries any per-item error
+    if not isinstance(item, dict):
+        return {'index': index, 'valid': False, 'error': "Each item must be a JSON object."}, None, None
+
+    result = {'index': index, 'signer': item.get('signer', item.get('signer_username')), 'valid': False, 'error': None}
+    if 'id' in item:
+        result['id'] = item['id']
+    if 'algorithm' in item:
+        result['algorithm'] = item['algorithm']
+
+    if not isinstance(result['signer'], str) or not isinstance(item.get('signature'), str):
+        result['error'] = "'signer' and 'signature' are required."
+        return result, None, None
+    try:
+        signature = base64.b64decode(item['signature'], validate=True)
+    except (binascii.Error, ValueError):
+        result['error'] = "'signature' is not valid base64."
+        return result, None, None
+
+    if isinstance(item.get('digest'), str):
+        try:
+            digest = bytes.fromhex(item['digest'])
+        except ValueError:
+            digest = b''
+        if len(digest) != hashlib.sha256().digest_size:
+            result['error'] = "'digest' must be a hex encoded SHA-256 digest."
+            return result, None, None
+    elif isinstance(item.get('document'), str):
+        try:
+            document = base64.b64decode(item['document'], validate=True)
+        except (binascii.Error, ValueError):
+            result['error'] = "'document' is not valid base64."
+            return result, None, None
+        digest = hashlib.sha256(document).digest()
+    else:
+        result['error'] = "Either 'digest' or 'document' is required."
+        return result, None, None
+
+    return result, digest, signature
+
+
+def _verify_chunk(tasks):
+    return [verify_digest_cached(signer, digest, signature) for signer, digest, signature in tasks]
+
+
+def verify_batch(items, max_workers=None):
+    """
+    Verifies many (digest or document, signature, signer) items at once.
+
+    Every signer's public key is resolved up front with one cache lookup and at
+    most one query, then the RSA checks are split across the crypto thread pool
+    (pycryptodome and hashlib release the GIL). Returns one result dict per
+    item, in request order; 'error' is set when an item could not be checked.
+    """
+    if not isinstance(items, list):
+        raise BatchVerifyError("'items' must be a list.")
+    max_items = getattr(settings, 'VERIFY_BATCH_MAX_ITEMS', DEFAULT_VERIFY_BATCH_MAX_ITEMS)
+    if len(items) > max_items:
+        raise BatchVerifyError(f"A batch may contain at most {max_items} items.")
+
+    prepared = [_prepare_item(index, item) for index, item in enumerate(items)]
+    signers = get_signer_keys(
+        result['signer'] for result, digest, _ in prepared if digest is not None
+    )
+
+    pending, tasks = [], []
+    for result, digest, signature in prepared:
+        if digest is None:
+            continue
+        signer = signers.get(result['signer'])
+        if signer is None:
+            result['error'] = f"Unknown signer '{result['signer']}'."
+            continue
+        if result.setdefault('algorithm', signer.algorithm) != signer.algorithm:
+            # Made with another key than the signer's current one; can't be valid
+            continue
+        pending.append(result)
+        tasks.append((signer, digest, signature))
+
+    workers = max_workers or getattr(settings, 'CRYPTO_EXECUTOR_WORKERS', None) or default_worker_count()
+    chunk_size = max(1, -(-len(tasks) // workers))
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+    if len(chunks) > 1:
+        outcomes = [valid for chunk in crypto_executor().map(_verify_chunk, chunks) for valid in chunk]
+    else:
+        outcomes = _verify_chunk(tasks)
+
+    for result, valid in zip(pending, outcomes):
+        result['valid'] = valid
+    return [result for result, _, _ in prepared]
+
+
+def made_with(signature_file, signer) -> bool:
+    """
+    Whether a parsed signature file can have been made with the signer's
+    current key. Files from before algorithms were recorded are RSA, like the
+    keys of the time, and only binary files carry a key fingerprint.
+    """
+    if (signature_file.algorithm or signer.algorithm) != signer.algorithm:
+        return False
+    return signature_file.fingerprint in (None, signer.fingerprint)
+
+
+def verify_merkle(signer, signature: bytes, signed_tree, leaves, size: int):
+    """
+    Checks a document's chunk hashes against a Merkle-mode signature, where
+    `signed_tree` comes from read_signed_tree(). Returns (valid, altered):
+    `altered` lists the changed byte ranges when the signed tree is authentic
+    but the document differs from it, and is None when the signature itself
+    doesn't verify.
+    """
+    chunk_size, signed_size, signed_leaves = signed_tree
+    if not verify_digest_cached(signer, signed_digest(chunk_size, signed_size, signed_leaves), signature):
+        return False, None
+    if size == signed_size and list(leaves) == signed_leaves:
+        return True, []
+    return False, altered_ranges(signed_leaves, leaves, chunk_size, signed_size, size)
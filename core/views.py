@@ -1,16 +1,37 @@
 import base64
 import os
 import json
-from django.shortcuts import get_object_or_404, render, redirect
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.template.defaultfilters import filesizeformat
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import HttpResponse
-from .models import UploadedFile,UserKeyPair
-from .utils import sign_message, decrypt_key,verify_signature
+from django.core.exceptions import RequestDataTooBig
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from .models import UploadedFile,UploadSession,UserKeyPair
+from .utils import aget_signer_key, key_cache_stats, verify_digest_cached
+from . import metrics
+from .workers import run_in_crypto_executor
+from .jobs import enqueue
+from .tasks import sign_uploaded_file, sign_uploaded_files
+from .uploadhandlers import DigestUploadHandler, HashingUploadHandler
+from .upload_sessions import (UploadSessionError, discard_session, finish_session, received_chunks,
+                              start_session, write_chunk)
+from .verification import BatchVerifyError, made_with, verify_batch, verify_merkle
+from .container import encode_container, read_signature_file, signature_json
+from .downloads import serve_file
+from .export import aiter_sync, iter_signed_zip
+from .algorithms import RSA_PKCS1_SHA256
 from .forms import MultipleFileUploadForm
-from django.contrib.auth.models import User
-from django.views.generic import ListView
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.views import View
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.utils.crypto import constant_time_compare
+from django.utils.timezone import now
+from datetime import datetime, timedelta
 
 def home(request):
     return render(request, 'core/home.html')
@@ -18,8 +39,16 @@ def home(request):
 def about(request):
     return render(request, 'core/about.html')
 
+@csrf_exempt
 @login_required
 def upload_view(request):
+    # Digests are computed as the files stream in, so the handler must be installed before request.POST is read
+    digest_handler = DigestUploadHandler(request)
+    request.upload_handlers.insert(0, digest_handler)
+    return _upload_view(request, digest_handler)
+
+@csrf_protect
+def _upload_view(request, digest_handler):
     if request.method == 'POST':
         form = MultipleFileUploadForm(request.POST, request.FILES)
         uploaded_files = request.FILES.getlist('uploaded_files')  # Match the input name in the HTML
@@ -30,10 +59,16 @@ def upload_view(request):
 
         if uploaded_files and form.is_valid():  # Ensure files are provided and the form is valid
             files_saved_count = 0
-            for file in uploaded_files:
+            for file, digest in zip(uploaded_files, digest_handler.digests['uploaded_files']):
+                # Lets the content-addressed storage name the blob without hashing the file again
+                file.sha256 = digest.sha256
                 new_file = UploadedFile(
                     owner=request.user,
-                    uploaded_file=file
+                    uploaded_file=file,
+                    original_name=os.path.basename(file.name),
+                    sha256=digest.sha256,
+                    blake2b=digest.blake2b,
+                    size=digest.size,
                 )
                 new_file.save()
                 files_saved_count += 1
@@ -49,26 +84,122 @@ def upload_view(request):
     
     return redirect('sign-home')
 
-class UserFileListView(LoginRequiredMixin, ListView):
-    model = UploadedFile
-    template_name = 'core/user_file_list.html'
-    context_object_name = 'files'
+def _upload_session_data(session):
+    return {
+        'id': str(session.pk),
+        'name': session.name,
+        'size': session.size,
+        'chunk_size': session.chunk_size,
+        'received': received_chunks(session),
+    }
 
-    def get_queryset(self):
-        # Fetch all files for the logged-in user
-        files = UploadedFile.objects.filter(owner=self.request.user)
+@login_required
+def upload_session_start_view(request):
+    """
+    Starts a resumable upload. POST {"name": ..., "size": ...}, then PUT each
+    chunk to the session URL with ?offset=<byte offset> and POST to .../complete/.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': "Use POST with a JSON body."}, status=405)
+    try:
+        payload = json.loads(request.body)
+        if not isinstance(payload, dict):
+            raise UploadSessionError("The request body must be a JSON object.")
+        session = start_session(request.user, payload.get('name'), payload.get('size'))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({'error': "The request body is not valid JSON."}, status=400)
+    except UploadSessionError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(_upload_session_data(session), status=201)
 
-        # Mark files as "new" if they were uploaded in the last 5 minutes
-        from datetime import timedelta
-        from django.utils.timezone import now
-        recent_threshold = now() - timedelta(minutes=5)
-        for file in files:
-            file.is_new = file.upload_date >= recent_threshold
+@login_required
+def upload_session_view(request, session_id):
+    # GET reports the chunks received so far, PUT stores one, DELETE abandons the upload
+    session = get_object_or_404(UploadSession, pk=session_id, owner=request.user)
+    if request.method == 'GET':
+        return JsonResponse(_upload_session_data(session))
+    if request.method == 'DELETE':
+        discard_session(session)
+        return HttpResponse(status=204)
+    if request.method != 'PUT':
+        return JsonResponse({'error': "Use GET, PUT or DELETE."}, status=405)
+    try:
+        offset = int(request.GET.get('offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        # Read the body as a stream; request.body would hold the whole chunk in memory
+        write_chunk(session, offset, request, length)
+    except ValueError as e:
+        return JsonResponse({'error': str(e) if isinstance(e, UploadSessionError) else "Invalid offset."}, status=400)
+    return HttpResponse(status=204)
 
-        # Sort files: new files first, then by upload date (descending)
-        sorted_files = sorted(files, key=lambda f: (f.is_new, f.upload_date), reverse=True)
+@login_required
+def upload_session_complete_view(request, session_id):
+    if request.method != 'POST':
+        return JsonResponse({'error': "Use POST."}, status=405)
+    session = get_object_or_404(UploadSession, pk=session_id, owner=request.user)
+    try:
+        uploaded_file = finish_session(session)
+    except UploadSessionError as e:
+        return JsonResponse({'error': str(e), 'received': received_chunks(session)}, status=409)
+    return JsonResponse({'file_id': uploaded_file.pk, 'name': str(uploaded_file)}, status=201)
+
+def _encode_cursor(file):
+    value = f"{file.upload_date.isoformat()}|{file.pk}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        upload_date, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(upload_date), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+class UserFileListView(View):
+    """
+    Async, keyset-paginated list of the user's files. Wrap with login_required
+    (see core/urls.py); LoginRequiredMixin can't check the user asynchronously.
+    """
+    template_name = 'core/user_file_list.html'
 
-        return sorted_files
+    async def get(self, request):
+        # Resolved once; templates read request.user, so hand them the same object
+        user = request.user = await request.auser()
+        # Mark files as "new" if they were uploaded in the last 5 minutes
+        recent_threshold = now() - timedelta(minutes=5)
+        # The chunk hashes of Merkle-signed files can run to thousands per row and aren't shown
+        files = UploadedFile.objects.filter(owner=user).defer('merkle_leaves').annotate(
+            is_new=ExpressionWrapper(Q(upload_date__gte=recent_threshold), output_field=BooleanField()),
+        )
+
+        # New files first, then by upload date (descending). Every new file is newer than every
+        # other file, so ordering by upload date alone gives that order and can use the
+        # (owner, upload_date) index.
+        page_size = getattr(settings, 'FILE_LIST_PAGE_SIZE', 50)
+        after = _decode_cursor(request.GET.get('after', ''))
+        before = _decode_cursor(request.GET.get('before', ''))
+
+        if before:
+            upload_date, pk = before
+            files = files.filter(Q(upload_date__gt=upload_date) | Q(upload_date=upload_date, pk__gt=pk))
+            page = [f async for f in files.order_by('upload_date', 'pk')[:page_size + 1]]
+            has_newer = len(page) > page_size
+            page = page[:page_size][::-1]
+            has_older = True
+        else:
+            if after:
+                upload_date, pk = after
+                files = files.filter(Q(upload_date__lt=upload_date) | Q(upload_date=upload_date, pk__lt=pk))
+            page = [f async for f in files.order_by('-upload_date', '-pk')[:page_size + 1]]
+            has_older = len(page) > page_size
+            page = page[:page_size]
+            has_newer = after is not None
+
+        context = {'files': page}
+        if page:
+            context['newer_cursor'] = _encode_cursor(page[0]) if has_newer else None
+            context['older_cursor'] = _encode_cursor(page[-1]) if has_older else None
+        # Templates read request.user and the session synchronously
+        return await sync_to_async(render)(request, self.template_name, context)
 
 @login_required
 def sign_file_view(request):
@@ -77,18 +208,15 @@ def sign_file_view(request):
             file_id = request.POST.get('file_id')
             file_to_sign = get_object_or_404(UploadedFile, pk=file_id, owner=request.user)
 
-            key_pair = UserKeyPair.objects.get(user=request.user)
-            decrypted_private_key = decrypt_key(key_pair.private_key_encrypted)
-
-            file_content = file_to_sign.uploaded_file.read()
-
-            signature_bytes = sign_message(decrypted_private_key, file_content)
-            signature_base64 = base64.b64encode(signature_bytes).decode('utf-8')
-
-            file_to_sign.signature = signature_base64
-            file_to_sign.save()
-
-            messages.success(request, f"Successfully signed '{file_to_sign}'.")
+            if settings.SIGN_IN_BACKGROUND:
+                # A `run_workers` process signs the file; the file list polls for the result
+                file_to_sign.signing_status = UploadedFile.SIGNING_QUEUED
+                file_to_sign.save(update_fields=['signing_status'])
+                enqueue('sign_file', file_id=file_to_sign.pk)
+                messages.info(request, f"'{file_to_sign}' was queued for signing.")
+            else:
+                sign_uploaded_file(file_to_sign)
+                messages.success(request, f"Successfully signed '{file_to_sign}'.")
 
         except Exception as e:
             messages.error(request, f"An error occurred: {e}")
@@ -97,54 +225,163 @@ def sign_file_view(request):
     return redirect('home')
 
 @login_required
-def download_signature_view(request, file_id):
-    file_object = get_object_or_404(UploadedFile, pk=file_id, owner=request.user)
+def sign_files_view(request):
+    # Signs a selection of files, or every unsigned file, with one key decrypt
+    if request.method != 'POST':
+        return redirect('user_file_list')
+
+    files = UploadedFile.objects.filter(owner=request.user)
+    if request.POST.get('all_unsigned'):
+        files = files.filter(signing_status__in=[UploadedFile.SIGNING_UNSIGNED, UploadedFile.SIGNING_FAILED])
+    else:
+        file_ids = [i for i in request.POST.getlist('file_ids') if i.isdigit()]
+        files = files.filter(pk__in=file_ids)
+
+    try:
+        results = sign_uploaded_files(request.user, files)
+    except UserKeyPair.DoesNotExist:
+        results, error = None, "You don't have a key pair to sign with."
+    signed = sum(1 for result in results or [] if result['status'] == 'signed')
+
+    if 'application/json' in request.headers.get('Accept', ''):
+        if results is None:
+            return JsonResponse({'error': error}, status=400)
+        return JsonResponse({'signed': signed, 'failed': len(results) - signed, 'results': results})
+
+    if results is None:
+        messages.error(request, error)
+    elif not results:
+        messages.info(request, "There were no files to sign.")
+    else:
+        messages.success(request, f"Signed {signed} of {len(results)} file(s).")
+        for result in results:
+            if result['status'] != 'signed':
+                messages.error(request, f"Could not sign '{result['name']}': {result['error']}")
+    return redirect('user_file_list')
+
+@login_required
+def file_status_view(request):
+    # Lightweight JSON endpoint polled by the file list while files are being signed
+    ids = [int(i) for i in request.GET.get('ids', '').split(',') if i.strip().isdigit()]
+    statuses = UploadedFile.objects.filter(owner=request.user, pk__in=ids).values_list('pk', 'signing_status')
+    return JsonResponse({'files': {str(pk): status for pk, status in statuses}})
+
+@login_required
+async def download_signature_view(request, file_id):
+    user = await request.auser()
+    file_object = await aget_object_or_404(UploadedFile, pk=file_id, owner=user)
 
     if not file_object.signature:
         messages.error(request, "This file has not been signed yet.")
         return redirect('user_file_list')
 
-    signature_data = {
-        'signer_username': file_object.owner.username,
-        'signature': file_object.signature
-    }
+    algorithm = file_object.signature_algorithm or RSA_PKCS1_SHA256
+    original_filename = os.path.splitext(str(file_object))[0].replace(' ', '_')
+    merkle = None
+    if file_object.signature_mode == UploadedFile.SIGNATURE_MERKLE:
+        merkle = (file_object.merkle_chunk_size, file_object.size, file_object.merkle_leaves)
+
+    if request.GET.get('format') == 'bin':
+        # Compact binary container: raw signature bytes, no base64 or JSON
+        signer = await aget_signer_key(user.username)
+        data = encode_container(user.username, algorithm, signer.fingerprint,
+                                base64.b64decode(file_object.signature), merkle)
+        response = HttpResponse(data, content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="{original_filename}.sig"'
+        return response
+
+    signature_data = signature_json(user.username, algorithm, file_object.signature_mode,
+                                    file_object.signature, merkle)
 
     json_data = json.dumps(signature_data, indent=4)
-    original_filename = os.path.splitext(file_object.uploaded_file.name)[0]
-    signature_filename = f"{original_filename.replace(' ', '_')}.json"
+    signature_filename = f"{original_filename}.json"
 
     response = HttpResponse(json_data, content_type='application/json')
     response['Content-Disposition'] = f'attachment; filename="{signature_filename}"'
     
     return response
 
-def verify_signature_view(request):
+@login_required
+def download_file_view(request, file_id):
+    file_object = get_object_or_404(UploadedFile, pk=file_id, owner=request.user)
+    return serve_file(request, file_object.uploaded_file, str(file_object), size=file_object.size,
+                      sha256=file_object.sha256, last_modified=file_object.upload_date)
+
+def _export_signature_json(username):
+    def signature_data(file_object):
+        merkle = None
+        if file_object.signature_mode == UploadedFile.SIGNATURE_MERKLE:
+            merkle = (file_object.merkle_chunk_size, file_object.size, file_object.merkle_leaves)
+        return signature_json(username, file_object.signature_algorithm or RSA_PKCS1_SHA256,
+                              file_object.signature_mode, file_object.signature, merkle)
+    return signature_data
+
+@login_required
+def export_signed_view(request):
+    # The archive is written while it is sent, one file at a time
+    parts = iter_signed_zip(request.user, _export_signature_json(request.user.username))
+    if isinstance(request, ASGIRequest):
+        # Django would buffer a sync iterator in full under ASGI
+        parts = aiter_sync(parts)
+    response = StreamingHttpResponse(parts, content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="signed-files-{now():%Y%m%d}.zip"'
+    return response
+
+@csrf_exempt
+async def verify_signature_view(request):
+    # The upload handler has to be installed before CSRF checking reads request.POST
+    hashing_handler = HashingUploadHandler(request)
+    request.upload_handlers.insert(0, hashing_handler)
+    if request.method == 'POST':
+        # Parse (and hash) the upload on the crypto executor rather than on the event loop
+        await run_in_crypto_executor(lambda: request.POST)
+    return await _verify_signature_view(request, hashing_handler)
+
+@csrf_protect
+async def _verify_signature_view(request, hashing_handler):
     if request.method == 'POST':
         original_file = request.FILES.get('original_file')
         signature_json_file = request.FILES.get('signature_file')
 
+        if hashing_handler.too_large:
+            messages.error(request, f"The original file is too large to verify. The limit is {filesizeformat(hashing_handler.max_size)}.")
+            return redirect('verify_signature')
+
         if not all([original_file, signature_json_file]):
-            messages.error(request, "Please provide both the original file and the signature JSON file.")
+            messages.error(request, "Please provide both the original file and the signature file.")
             return redirect('verify_signature')
 
         try:
             # 1. Find the user and get their public key
-            json_content = signature_json_file.read()
-            signature_data = json.loads(json_content)
-
-            signer_username = signature_data['signer_username']
-            signature_base64 = signature_data['signature'].encode('utf-8')
-
-            signer = User.objects.get(username=signer_username)
-            key_pair = UserKeyPair.objects.get(user=signer)
-            public_key_bytes = key_pair.public_key.encode('utf-8')
-            
-            original_content = original_file.read()
-            signature_bytes = base64.b64decode(signature_base64)
-
-            is_valid = verify_signature(public_key_bytes, original_content, signature_bytes)
+            with metrics.stage('signature_parse'):
+                content = await run_in_crypto_executor(signature_json_file.read)
+                signature_file = read_signature_file(content)
+            signer_username = signature_file.signer
+
+            signer = await aget_signer_key(signer_username)
+
+            # 2. The original file was hashed while it was being received
+            altered = None
+            if not made_with(signature_file, signer):
+                is_valid = False
+            elif signature_file.merkle:
+                if original_file.leaves is None:
+                    messages.error(request, "This is a chunked signature. Please send the signature file before the original file.")
+                    return redirect('verify_signature')
+                is_valid, altered = await run_in_crypto_executor(
+                    verify_merkle, signer, signature_file.signature, signature_file.merkle,
+                    original_file.leaves, original_file.size,
+                )
+            else:
+                is_valid = await run_in_crypto_executor(
+                    verify_digest_cached, signer, original_file.digest, signature_file.signature,
+                )
 
-            if is_valid:
+            if altered:
+                shown = ', '.join(f"{start:,}-{end:,}" for start, end in altered[:5])
+                more = f" and {len(altered) - 5} more" if len(altered) > 5 else ""
+                messages.error(request, f"Signature is INVALID. The file was altered in bytes {shown}{more}. ❌")
+            elif is_valid:
                 messages.success(request, f"Signature is VALID. Verified as signed by '{signer_username}'.")
             else:
                 messages.error(request, "Signature is INVALID. The file may have been altered or the signature is incorrect. ❌")
@@ -153,14 +390,60 @@ def verify_signature_view(request):
             messages.error(request, "Invalid signature file. It appears to be a corrupted JSON file.")
         except KeyError:
             messages.error(request, "Invalid signature file. The JSON file is missing 'signer_username' or 'signature'.")
-        except User.DoesNotExist:
+        except UserKeyPair.DoesNotExist:
             messages.error(request, f"Error: The signer '{signer_username}' specified in the signature file was not found.")
+        except ValueError as e:
+            messages.error(request, f"Invalid signature file. {e}")
         except Exception as e:
             messages.error(request, f"An unexpected error occurred: {e}")
         
         return redirect('verify_signature')
 
-    return render(request, 'core/verify_signature.html')
+    return await sync_to_async(render)(request, 'core/verify_signature.html')
+
+@csrf_exempt
+def verify_batch_api(request):
+    """
+    JSON API for verifying many signatures in one request. POST a body like
+
+        {"items": [{"id": "any", "signer": "alice", "signature": "<base64>",
+                    "digest": "<hex sha256>"}, ...]}
+
+    with "document": "<base64>" in place of "digest" for clients that don't hash
+    themselves. Responds with one result per item, in order.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': "Use POST with a JSON body."}, status=405)
+    try:
+        payload = json.loads(request.body)
+        results = verify_batch(payload.get('items') if isinstance(payload, dict) else None)
+    except RequestDataTooBig:
+        return JsonResponse({'error': "The request body is too large. Send digests instead of documents."}, status=413)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({'error': "The request body is not valid JSON."}, status=400)
+    except BatchVerifyError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    valid = sum(1 for result in results if result['valid'])
+    errors = sum(1 for result in results if result['error'])
+    return JsonResponse({'valid': valid, 'invalid': len(results) - valid - errors, 'errors': errors, 'results': results})
+
+def metrics_view(request):
+    # Prometheus text format; scrapers authenticate with METRICS_TOKEN, people as staff
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    elif not (request.user.is_active and request.user.is_staff):
+        return HttpResponse(status=403)
+    if not metrics.enabled():
+        return HttpResponse("Metrics are disabled. Set METRICS_ENABLED=True.\n", status=404, content_type='text/plain')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@staff_member_required
+def cache_stats_view(request):
+    # Hit rates of this process's key and verification caches
+    return JsonResponse(key_cache_stats())
 
 # Get files 
 def encrypt(request,file_id):
@@ -174,7 +457,7 @@ def delete_file_view(request, file_id):
         try:
             file_to_delete = get_object_or_404(UploadedFile, pk=file_id, owner=request.user)
             file_name = str(file_to_delete)
-            file_to_delete.uploaded_file.delete()
+            # The stored file is released by the post_delete signal
             file_to_delete.delete()
 
             messages.success(request, f"File '{file_name}' was deleted successfully.")
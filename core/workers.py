@@ -0,0 +1,45 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+_crypto_executor = None
+_crypto_executor_lock = threading.Lock()
+
+
+def default_worker_count():
+    return os.cpu_count() or 1
+
+
+def process_pool(max_workers=None):
+    """
+    Returns a ProcessPoolExecutor whose workers have Django set up, so tasks
+    may be any module-level function from this project.
+    """
+    # Children must not share the parent's open database connections
+    connections.close_all()
+    return ProcessPoolExecutor(max_workers=max_workers or default_worker_count(), initializer=django.setup)
+
+
+def crypto_executor():
+    """
+    The bounded thread pool async views use for hashing, multipart parsing and
+    RSA operations, so that CPU-heavy work stays off the event loop.
+    """
+    global _crypto_executor
+    with _crypto_executor_lock:
+        if _crypto_executor is None:
+            _crypto_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'CRYPTO_EXECUTOR_WORKERS', None) or default_worker_count(),
+                thread_name_prefix='crypto',
+            )
+        return _crypto_executor
+
+
+def run_in_crypto_executor(func, *args, **kwargs):
+    # Returns an awaitable; func must not touch the database
+    return sync_to_async(func, thread_sensitive=False, executor=crypto_executor())(*args, **kwargs)
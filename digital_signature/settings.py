@@ -48,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Removes itself unless METRICS_ENABLED is set
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -93,6 +95,22 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Holds cached signer public keys, which every worker and management command has to
+# share: rotate_keys clears them from its own process. The default keeps them in a
+# database table (created by migrations); CACHE_BACKEND/CACHE_LOCATION can point at
+# Redis instead. LocMemCache is per process, so with it other processes keep a replaced
+# public key for up to SIGNER_CACHE_TTL seconds.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'core_cache'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -130,10 +148,30 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Uploaded documents are stored content-addressed, so identical uploads share one file
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    # The manifest storage needs `collectstatic`; point STATICFILES_BACKEND at
+    # django.contrib.staticfiles.storage.StaticFilesStorage to run without it
+    'staticfiles': {
+        'BACKEND': os.getenv('STATICFILES_BACKEND', 'whitenoise.storage.CompressedManifestStaticFilesStorage'),
+    },
+    'uploads': {
+        'BACKEND': os.getenv('UPLOAD_STORAGE_BACKEND', 'core.storage.ContentAddressedStorage'),
+    },
+}
+# How /download/<id>/ sends files: '' serves them from Django, 'x-accel-redirect' (nginx) or
+# 'x-sendfile' (Apache, lighttpd) hands the transfer to the web server after the ownership check.
+# For nginx, DOWNLOAD_ACCEL_PREFIX must be an `internal` location aliased to MEDIA_ROOT.
+DOWNLOAD_OFFLOAD = os.getenv('DOWNLOAD_OFFLOAD', '').lower()
+DOWNLOAD_ACCEL_PREFIX = os.getenv('DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -141,4 +179,87 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK='bootstrap5'
 LOGIN_REDIRECT_URL='sign-home'
-LOGIN_URL='login'
\ No newline at end of file
+LOGIN_URL='login'
+# Largest original file accepted by the public verification page, in bytes
+VERIFY_MAX_UPLOAD_SIZE = int(os.getenv('VERIFY_MAX_UPLOAD_SIZE', 2 * 1024 ** 3))
+# Most items one request to the batch verify API may carry
+VERIFY_BATCH_MAX_ITEMS = int(os.getenv('VERIFY_BATCH_MAX_ITEMS', 1000))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': os.getenv('CORE_LOG_LEVEL', 'INFO')},
+    },
+}
+
+# In-process cache of imported RSA keys (entries, seconds)
+KEY_CACHE_SIZE = int(os.getenv('KEY_CACHE_SIZE', 1024))
+KEY_CACHE_TTL = int(os.getenv('KEY_CACHE_TTL', 300))
+
+# Signer public key lookups: shared Django cache TTL and the shorter in-process TTL
+SIGNER_CACHE_ENABLED = os.getenv('SIGNER_CACHE_ENABLED', 'True') == 'True'
+SIGNER_CACHE_TTL = int(os.getenv('SIGNER_CACHE_TTL', 600))
+SIGNER_CACHE_LOCAL_TTL = int(os.getenv('SIGNER_CACHE_LOCAL_TTL', 30))
+
+# Per-process cache of verification outcomes, so re-checking the same document,
+# signature and key skips the RSA operation
+VERIFY_CACHE_ENABLED = os.getenv('VERIFY_CACHE_ENABLED', 'True') == 'True'
+VERIFY_CACHE_SIZE = int(os.getenv('VERIFY_CACHE_SIZE', 10000))
+VERIFY_CACHE_TTL = int(os.getenv('VERIFY_CACHE_TTL', 3600))
+
+# Algorithm for new and rotated key pairs: 'rsa', 'ed25519' or 'ecdsa-p256'.
+# KEY_SIZE applies to RSA only.
+SIGNING_ALGORITHM = os.getenv('SIGNING_ALGORITHM', 'rsa')
+KEY_SIZE = 2048
+
+# Files of at least this many bytes are signed as a Merkle tree of fixed-size chunks,
+# hashed in parallel (0 signs every file as one digest)
+MERKLE_SIGN_THRESHOLD = int(os.getenv('MERKLE_SIGN_THRESHOLD', 1024 ** 3))
+MERKLE_CHUNK_SIZE = int(os.getenv('MERKLE_CHUNK_SIZE', 4 * 1024 ** 2))
+MERKLE_HASH_WORKERS = int(os.getenv('MERKLE_HASH_WORKERS', 0)) or None
+
+# Master keys that encrypt the stored private keys, comma separated, newest first. The first one
+# encrypts; all of them decrypt. Defaults to SECRET_KEY. To rotate, put a new secret in front,
+# run `manage.py reencrypt_keys`, then remove the old one.
+FERNET_KEYS = [key.strip() for key in os.getenv('FERNET_KEYS', '').split(',') if key.strip()]
+
+# Pre-generated key pool, refilled by `manage.py fill_key_pool`
+KEY_POOL_SIZE = int(os.getenv('KEY_POOL_SIZE', 50))
+KEY_POOL_REFILL_BATCH = int(os.getenv('KEY_POOL_REFILL_BATCH', 0))
+KEY_POOL_REFILL_INTERVAL = float(os.getenv('KEY_POOL_REFILL_INTERVAL', 10))
+
+# Queue signing for `manage.py run_workers` instead of signing inside the request
+SIGN_IN_BACKGROUND = os.getenv('SIGN_IN_BACKGROUND') == 'True'
+
+# Also record a BLAKE2b digest for every upload
+UPLOAD_BLAKE2B = os.getenv('UPLOAD_BLAKE2B') == 'True'
+
+# Resumable uploads: chunk size, largest file, and how long an unfinished upload is kept (seconds)
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 ** 2))
+UPLOAD_SESSION_MAX_SIZE = int(os.getenv('UPLOAD_SESSION_MAX_SIZE', 16 * 1024 ** 3))
+UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL', 24 * 3600))
+# Unfinished uploads per user, and the bytes their staged files may reserve in total
+UPLOAD_SESSIONS_PER_USER = int(os.getenv('UPLOAD_SESSIONS_PER_USER', 20))
+UPLOAD_RESERVED_BYTES_PER_USER = int(os.getenv('UPLOAD_RESERVED_BYTES_PER_USER', 32 * 1024 ** 3))
+
+# Profile pictures are resized to these sizes (pixels), as JPEG and WebP. Set
+# PROFILE_IMAGES_IN_BACKGROUND=True to leave that to `run_workers` instead of a thread in the web process.
+PROFILE_IMAGE_SIZES = tuple(int(s) for s in os.getenv('PROFILE_IMAGE_SIZES', '64,128,256').split(','))
+PROFILE_IMAGES_IN_BACKGROUND = os.getenv('PROFILE_IMAGES_IN_BACKGROUND') == 'True'
+
+# Stage timings, per-view latency and query counts, served in Prometheus format at /metrics/
+# (to staff, or to anyone sending "Authorization: Bearer <METRICS_TOKEN>"). Metrics are per process.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED') == 'True'
+# Also report each request's stage timings in a Server-Timing response header
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Files per page on the "My Uploaded Files" list
+FILE_LIST_PAGE_SIZE = int(os.getenv('FILE_LIST_PAGE_SIZE', 50))
+
+# Threads async views use for hashing and RSA work (default: one per CPU core)
+CRYPTO_EXECUTOR_WORKERS = int(os.getenv('CRYPTO_EXECUTOR_WORKERS', 0)) or None
@@ -0,0 +1,8 @@
+# Read by gunicorn when started from the project root, e.g. `gunicorn digital_signature.wsgi`
+
+
+def post_worker_init(worker):
+    # Runs in each worker once the app is loaded (after the fork, also with --preload),
+    # so the first request doesn't pay for the crypto setup
+    from core.utils import warm_up
+    warm_up()
@@ -6,4 +6,6 @@ class UsersConfig(AppConfig):
     name = 'users'
 
     def ready(self):
-        import users.signals
\ No newline at end of file
+        import users.signals
+        # Registers the job handlers run by `manage.py run_workers`
+        import users.tasks
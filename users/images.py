@@ -0,0 +1,104 @@
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_IMAGE_SIZES = (64, 128, 256)
+DEFAULT_IMAGE = 'default.jpg'
+FORMATS = {'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+           'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4})}
+
+# Used when no `run_workers` process is around: the request still returns before the work starts
+_local_executor = None
+
+
+def variant_sizes():
+    return tuple(sorted(getattr(settings, 'PROFILE_IMAGE_SIZES', DEFAULT_PROFILE_IMAGE_SIZES), reverse=True))
+
+
+def variant_name(sha256, size, extension):
+    # Named by content, so a URL never changes meaning and can be cached indefinitely
+    return f"profile_pics/variants/{sha256[:2]}/{sha256}-{size}.{extension}"
+
+
+def render_variants(source, sha256, sizes=None):
+    """
+    Writes square-bounded JPEG and WebP versions of the image at `source`, one
+    per size, and returns {"<size>": {"jpeg": name, "webp": name}}.
+
+    JPEGs are decoded by libjpeg at 1/2, 1/4 or 1/8 scale through draft(), and
+    each smaller size is reduced from the previous one, so a camera photo is
+    never decoded at full resolution.
+    """
+    sizes = sizes or variant_sizes()
+    with Image.open(source) as original:
+        original.draft('RGB', (sizes[0], sizes[0]))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        variants = {}
+        for size in sizes:
+            image.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            variants[str(size)] = {}
+            for key, (image_format, extension, options) in FORMATS.items():
+                buffer = io.BytesIO()
+                image.save(buffer, image_format, **options)
+                name = variant_name(sha256, size, extension)
+                if not default_storage.exists(name):
+                    name = default_storage.save(name, ContentFile(buffer.getvalue()))
+                variants[str(size)][key] = name
+    return variants
+
+
+def build_profile_variants(profile_id, sha256):
+    from .models import Profile
+
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is None or profile.image_sha256 != sha256:
+        return  # deleted, or replaced by a newer picture that has its own job
+    with profile.image.open('rb') as source:
+        variants = render_variants(source, sha256)
+    # Only lands if the picture wasn't replaced while we worked
+    Profile.objects.filter(pk=profile_id, image_sha256=sha256).update(image_variants=variants)
+
+
+def _build_locally(profile_id, sha256):
+    try:
+        build_profile_variants(profile_id, sha256)
+    except Exception:
+        logger.exception("Building the images of profile %s failed", profile_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(profile):
+    if getattr(settings, 'PROFILE_IMAGES_IN_BACKGROUND', False):
+        from core.jobs import enqueue
+        enqueue('profile_images', profile_id=profile.pk, sha256=profile.image_sha256)
+        return
+    global _local_executor
+    if _local_executor is None:
+        _local_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='profile-images')
+    _local_executor.submit(_build_locally, profile.pk, profile.image_sha256)
+
+
+def delete_images(image_name, sha256, variants):
+    """
+    Removes a replaced picture. Variants are shared by every profile showing
+    the same picture, so they are kept while another profile still uses it.
+    """
+    from .models import Profile
+
+    if image_name and image_name != DEFAULT_IMAGE:
+        default_storage.delete(image_name)
+    if sha256 and not Profile.objects.filter(image_sha256=sha256).exists():
+        for names in (variants or {}).values():
+            for name in names.values():
+                default_storage.delete(name)
@@ -1,20 +1,50 @@
-from django.db import models
+import hashlib
+from functools import partial
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from PIL import Image
+
+from .images import delete_images, schedule_variants
 
 class Profile(models.Model):
     user=models.OneToOneField(User, on_delete=models.CASCADE)
     image=models.ImageField(default='default.jpg',upload_to='profile_pics')
+    # SHA-256 of the uploaded picture; the resized variants are only rebuilt when it changes
+    image_sha256=models.CharField(max_length=64, blank=True)
+    # {"<size>": {"jpeg": name, "webp": name}}, filled in by the image pipeline
+    image_variants=models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return f"{self.user.username} Profile"
+
+    def image_variant(self, size):
+        # Names of the smallest variant at least `size` pixels wide, or of the largest one
+        if not self.image_variants:
+            return None
+        available = sorted(int(s) for s in self.image_variants)
+        best = next((s for s in available if s >= size), available[-1])
+        return self.image_variants[str(best)]
     
     def save(self, *args, **kwargs):
+        replaced = None
+        if self.image and not self.image._committed:
+            digest = hashlib.sha256()
+            for chunk in self.image.file.chunks():
+                digest.update(chunk)
+            digest = digest.hexdigest()
+            stored = Profile.objects.filter(pk=self.pk).values('image', 'image_sha256', 'image_variants').first()
+            if stored and stored['image_sha256'] == digest:
+                # The same picture again: keep the stored file and its variants
+                self.image = stored['image']
+            else:
+                replaced = stored or {}
+                self.image_sha256 = digest
+                self.image_variants = {}
         super().save(*args, **kwargs)
 
-        img = Image.open(self.image.path)
-
-        if img.height>300 or img.width>300:
-            output_size=(300,300)
-            img.thumbnail(output_size)
-            img.save(self.image.path)
\ No newline at end of file
+        if replaced is not None:
+            transaction.on_commit(partial(schedule_variants, self))
+            if replaced:
+                transaction.on_commit(partial(
+                    delete_images, replaced['image'], replaced['image_sha256'], replaced['image_variants'],
+                ))
@@ -0,0 +1,8 @@
+from core.jobs import job_handler
+
+from .images import build_profile_variants
+
+
+@job_handler('profile_images')
+def profile_images_job(profile_id, sha256):
+    build_profile_variants(profile_id, sha256)
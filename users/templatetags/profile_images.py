@@ -0,0 +1,24 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def profile_picture(profile, size, css_class='', alt='Profile image'):
+    """
+    An <img> of `profile`'s picture for display at `size` CSS pixels, using
+    the resized variant for 2x screens (WebP where supported) once the image
+    pipeline has built it, and the uploaded file until then.
+    """
+    size = int(size)
+    variant = profile.image_variant(size * 2)
+    if variant is None:
+        return format_html('<img src="{}" class="{}" alt="{}" width="{}" height="{}" style="object-fit: cover;">',
+                           profile.image.url, css_class, alt, size, size)
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp">'
+        '<img src="{}" class="{}" alt="{}" width="{}" height="{}" style="object-fit: cover;"></picture>',
+        default_storage.url(variant['webp']), default_storage.url(variant['jpeg']), css_class, alt, size, size,
+    )
@@ -3,7 +3,6 @@ from django.contrib import messages
 from django.contrib.auth.forms import UserCreationForm
 from .forms import UserRegisterForm,UserUpdateForm,ProfileUpdateForm
 from django.contrib.auth.decorators import login_required
-import os
 
 def register(request):
     if request.method=="POST":
@@ -24,17 +23,9 @@ def profile(request):
         p_form=ProfileUpdateForm(request.POST, 
                                  request.FILES, 
                                  instance=request.user.profile)
-        old_image = request.user.profile.image
         if u_form.is_valid() and p_form.is_valid():
-            if 'image' in request.FILES:
-                if old_image and os.path.basename(old_image.name) != "default.jpg":
-                    old_image_path = old_image.path
-                    if os.path.exists(old_image_path):
-                        try:
-                            os.remove(old_image_path)
-                        except Exception:
-                            pass
             u_form.save() 
+            # Resizing happens off the request, and only if the picture changed (see Profile.save)
             p_form.save()
             messages.success(request,f"Your account has been updated")
             return redirect('profile')